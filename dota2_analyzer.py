@@ -6,11 +6,30 @@ Dota 2 玩家数据分析工具 - 增强版
 import requests
 import time
 import json
+import random
+import threading
+import argparse
+import sqlite3
 from collections import defaultdict
-from datetime import datetime
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
 import csv
+import codecs
+import hashlib
+import io
+import re
+import shutil
+import struct
+import sys
+import zipfile
+import zlib
 import os
 
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖，仅 --backend numpy 需要
+    np = None
+
 # ============== 配置区域 ==============
 
 # 队伍和玩家数据
@@ -105,9 +124,62 @@ TEAMS = {
 
 # API 配置
 BASE_URL = "https://api.opendota.com/api"
-REQUEST_DELAY = 1.5
 MATCHES_LIMIT = 100
 
+# 比赛记录只请求分析用到的字段（OpenDota project= 参数）
+MATCH_FIELDS = [
+    "match_id", "hero_id", "player_slot", "radiant_win",
+    "kills", "deaths", "assists", "duration", "start_time",
+]
+
+# 并发抓取配置
+API_RATE_LIMIT = 60    # OpenDota 免费额度：每分钟请求数
+API_BURST = 5          # 令牌桶容量（允许的瞬时突发请求数）
+FETCH_WORKERS = 4      # 并发抓取线程数，1 表示逐个串行抓取
+ANALYSIS_WORKERS = 0   # 分析进程数，0 表示在抓取线程中直接分析（--analysis-workers）
+REPORT_WORKERS = 4     # 并行生成报告的线程数，1 表示逐个生成
+
+# HTTP 连接池配置
+HTTP_POOL_SIZE = 8     # 保持的长连接数，应不小于并发抓取线程数的两倍（每名玩家的资料与比赛同时请求）
+
+# 自适应限流配置
+API_MIN_RATE = 6       # 连续限流时速率下限（每分钟请求数）
+API_MAX_RETRIES = 5    # 429/5xx/网络错误的最大重试次数
+API_BACKOFF_BASE = 1.0 # 退避基数（秒）：第n次重试约等待 base*2^n，并加随机抖动
+
+# 本地响应缓存配置
+CACHE_FILE = "cache/opendota_cache.sqlite3"
+CACHE_TTL = {
+    "heroes": 7 * 24 * 3600,   # 英雄列表：7天
+    "player": 6 * 3600,        # 玩家信息：6小时
+    "matches": 10 * 60,        # 比赛记录：10分钟
+}
+FRAGMENT_CACHE_FILE = "cache/fragments.sqlite3"  # 报告片段缓存（选手卡片、Ban表、队伍）
+FRAGMENT_QUERY_BATCH = 500                       # 批量读取片段时每次查询的键数（低于 SQLite 的参数个数上限）
+FRAGMENT_CACHE_MAX_AGE = 7 * 24 * 3600           # 片段超过该时长未重新生成即删除
+
+# 英雄数据快照配置
+HERO_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "heroes.json")  # 随仓库发布
+HERO_TABLE_CACHE = "cache/heroes.json"   # 后台刷新后写入的本地副本
+HERO_TABLE_MAX_AGE = 7 * 24 * 3600       # 快照超过该时长才在后台刷新
+
+# 增量比赛同步配置
+MATCH_STORE_FILE = "cache/match_store.sqlite3"
+SYNC_PAGE_SIZE = 5     # 增量同步首页大小，之后每页翻倍
+
+# 深度历史配置（--deep）
+DEEP_HISTORY_LIMIT = 5000  # 每名玩家默认分析的比赛数
+DEEP_PAGE_SIZE = 500       # 每页请求的比赛数
+STREAM_CHUNK_SIZE = 64 * 1024  # 流式解析每次从响应中读取的字节数
+
+# 断点续传配置
+CHECKPOINT_FILE = "cache/checkpoints.sqlite3"
+RESUME_MAX_AGE = 6 * 3600  # --resume 默认复用6小时内完成的玩家
+
+# 输出目录保留策略
+RETAIN_PER_DAY = 3      # 每天保留最后N次运行的文件，0 表示全部保留
+ARCHIVE_AFTER_DAYS = 7  # 超过该天数的运行只把结果快照压缩进按月滚动的归档
+
 # 位置分析 - 英雄角色映射
 # 1=Carry, 2=Mid, 3=Offlane, 4=Soft Support, 5=Hard Support
 HERO_POSITIONS = {
@@ -134,7 +206,7 @@ HERO_POSITIONS = {
     "Beastmaster": 3, "Dark Seer": 3, "Enigma": 3, "Magnus": 3,
     "Sand King": 3, "Slardar": 3, "Spirit Breaker": 3, "Clockwerk": 3,
     "Night Stalker": 3, "Doom": 3, "Brewmaster": 3, "Elder Titan": 3,
-    "Primal Beast": 3, "Marci": 3, "Dawn Breaker": 3, "Dragon Knight": 3,
+    "Primal Beast": 3, "Marci": 3, "Dawnbreaker": 3, "Dragon Knight": 3,
     "Batrider": 3, "Earth Spirit": 3, "Phoenix": 3,
 
     # Soft Support (4号位)
@@ -208,47 +280,557 @@ def parse_rank_tier(rank_tier, leaderboard_rank=None, computed_mmr=None):
         "display": display
     }
 
+# ============== API 请求 ==============
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限流器，所有抓取线程共享同一份请求额度
+    速率自适应：收到 429/5xx 时减半并暂停发放令牌，响应头显示额度将尽时减速，
+    额度充足时逐步恢复到 rate_per_minute
+    """
+
+    def __init__(self, rate_per_minute, capacity, min_rate_per_minute=None):
+        self.max_rate = rate_per_minute / 60.0  # 每秒补充的令牌数上限
+        self.min_rate = (min_rate_per_minute or rate_per_minute) / 60.0
+        self.rate = self.max_rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取出一个令牌，额度不足或处于退避暂停时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def observe(self, headers):
+        """根据响应头中的剩余额度调整速率：额度将尽时减半，否则逐步加速"""
+        try:
+            remaining = int(headers.get("X-Rate-Limit-Remaining-Minute"))
+        except (TypeError, ValueError):
+            remaining = None
+        with self.lock:
+            if remaining is not None and remaining < self.capacity:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = min(self.tokens, remaining)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    def throttle(self, delay):
+        """收到 429/5xx：速率减半，清空令牌并在 delay 秒内暂停发放"""
+        with self.lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.updated = self.paused_until
+
+    def summary(self):
+        """限流统计"""
+        return f"限流器: 当前速率 {self.rate * 60:.0f} 次/分钟，触发限流/服务端错误 {self.throttled} 次"
+
+rate_limiter = TokenBucket(API_RATE_LIMIT, API_BURST, API_MIN_RATE)
+
+def create_http_session(pool_size=HTTP_POOL_SIZE):
+    """创建带连接池的 HTTP 会话：长连接复用（省去每次 TCP+TLS 握手），并声明支持 gzip 压缩"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+# 所有抓取函数共享的 HTTP 会话
+http_session = create_http_session()
+
+def backoff_delay(attempt, retry_after=None):
+    """第 attempt 次重试前的等待秒数：优先遵循 Retry-After，否则指数退避并加随机抖动"""
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return API_BACKOFF_BASE * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+def open_sqlite(path, schema):
+    """打开（必要时创建）本地 SQLite 数据库，连接可在多个线程间共享（调用方自行加锁）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute(schema)
+    conn.commit()
+    return conn
+
+class ResponseCache:
+    """
+    基于 SQLite 的 API 响应缓存，以 URL + 参数为键
+    max_age 不为 None 时覆盖各接口的 TTL（用于从已缓存数据快速重新生成报告）
+    """
+
+    def __init__(self, path, max_age=None):
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = open_sqlite(
+            path,
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def make_key(url, params=None):
+        """由 URL 和排序后的参数生成缓存键"""
+        if not params:
+            return url
+        return f"{url}?{json.dumps(params, sort_keys=True, ensure_ascii=False)}"
+
+    def get(self, key, ttl):
+        """读取未过期的缓存，未命中返回 None"""
+        max_age = ttl if self.max_age is None else self.max_age
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > max_age:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, body):
+        """写入（覆盖）一条缓存"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, fetched_at) VALUES (?, ?, ?)",
+                (key, body, time.time())
+            )
+            self.conn.commit()
+
+    def summary(self):
+        """缓存命中统计"""
+        total = self.hits + self.misses
+        rate = round(self.hits / total * 100, 1) if total else 0
+        return f"缓存命中 {self.hits} 次 / 未命中 {self.misses} 次 (命中率 {rate}%)"
+
+# 由入口按命令行参数创建；为 None 时不使用缓存
+response_cache = None
+
+def api_request(url, params=None, stream=False):
+    """
+    发起一次 GET 请求并返回状态正常的响应
+    发起网络请求前从全局令牌桶取令牌；429/5xx 和网络错误属于暂时性问题，
+    退避后重试最多 API_MAX_RETRIES 次。stream=True 时响应正文留待调用方逐块读取
+    """
+    for attempt in range(API_MAX_RETRIES + 1):
+        rate_limiter.acquire()
+        try:
+            response = http_session.get(url, params=params, timeout=30, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == API_MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"  ⏳ 网络错误 ({type(e).__name__})，{delay:.1f}秒后重试 ({attempt + 1}/{API_MAX_RETRIES})")
+            time.sleep(delay)
+            continue
+
+        if response.status_code == 429 or response.status_code >= 500:
+            response.close()
+            if attempt == API_MAX_RETRIES:
+                response.raise_for_status()
+            delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+            rate_limiter.throttle(delay)
+            print(f"  ⏳ 请求受限 (HTTP {response.status_code})，{delay:.1f}秒后重试 ({attempt + 1}/{API_MAX_RETRIES})")
+            continue
+
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+        rate_limiter.observe(response.headers)
+        return response
+
+def api_get(path, params=None, ttl=0):
+    """
+    请求 OpenDota API，返回解析后的JSON
+    启用缓存时优先读取 ttl 秒内的缓存，未命中再经 api_request 发起请求
+    """
+    url = f"{BASE_URL}{path}"
+    cache = response_cache
+    key = None
+    if cache is not None:
+        key = ResponseCache.make_key(url, params)
+        cached = cache.get(key, ttl)
+        if cached is not None:
+            return cached
+
+    response = api_request(url, params)
+    data = response.json()
+    if cache is not None:
+        cache.put(key, response.text)
+    return data
+
+def iter_json_array(chunks):
+    """
+    增量解析 JSON 数组：从字节块迭代器中逐个产出数组元素
+    缓冲区只保留尚未解析完的部分，内存占用与单个元素而非整个数组成正比
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    started = exhausted = False
+
+    while True:
+        # 跳过空白、数组开头的 [ 和元素之间的逗号
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[":
+            if buffer[pos] == "[":
+                if started:
+                    break
+                started = True
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        if pos < len(buffer) and not started:
+            raise ValueError(f"响应不是 JSON 数组: {buffer[pos:pos + 20]!r}")
+
+        if pos < len(buffer):
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                value = end = None  # 元素不完整，继续读取
+            # 数字等标量在块边界处可能被截断（如 "-15" 后面还有 "00.5"），
+            # 要看到后面的分隔符才算完整
+            if end is not None and (exhausted or (end < len(buffer) and buffer[end] in " \t\r\n,]")):
+                pos = end
+                yield value
+                continue
+        if exhausted:
+            raise ValueError("JSON 数组不完整")
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[pos:] + utf8.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+
+def api_stream(path, params=None):
+    """
+    请求返回 JSON 数组的 OpenDota 接口，边接收边逐个产出数组元素（不读写响应缓存）
+    响应正文不会整体保留在内存中，适合大 limit 的比赛记录
+    """
+    response = api_request(f"{BASE_URL}{path}", params, stream=True)
+    try:
+        yield from iter_json_array(response.iter_content(STREAM_CHUNK_SIZE))
+    finally:
+        response.close()
+
 # ============== 英雄数据 ==============
 
-def get_heroes_map():
-    """获取英雄ID到名称的映射"""
-    print("正在获取英雄列表...")
-    url = f"{BASE_URL}/heroes"
+def load_hero_table():
+    """
+    加载本地英雄数据快照（id、英文名、角色）；位置判断只用 HERO_POSITIONS
+    后台刷新过的副本与随仓库发布的快照中取更新时间较新的一份；都不可用时返回 None
+    """
+    best = None
+    for path in (HERO_TABLE_CACHE, HERO_TABLE_FILE):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                table = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if best is None or table.get("updated_at", "") > best.get("updated_at", ""):
+            best = table
+    return best
+
+def hero_table_is_stale(table):
+    """快照是否超过 HERO_TABLE_MAX_AGE 未刷新"""
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        heroes = response.json()
-        hero_map = {hero['id']: hero['localized_name'] for hero in heroes}
-        print(f"成功获取 {len(hero_map)} 个英雄数据")
-        return hero_map
-    except Exception as e:
-        print(f"获取英雄列表失败: {e}")
-        return {}
+        updated_at = datetime.fromisoformat(table["updated_at"])
+    except (KeyError, ValueError):
+        return True
+    return (datetime.now() - updated_at).total_seconds() > HERO_TABLE_MAX_AGE
+
+def refresh_hero_table(table):
+    """
+    从 OpenDota 拉取英雄列表并与本地快照合并（接口未返回角色时保留本地的），
+    写入 HERO_TABLE_CACHE；英雄有变化时版本号加一
+    """
+    heroes = api_get("/heroes", ttl=CACHE_TTL["heroes"])
+    known = {hero["id"]: hero for hero in table["heroes"]} if table else {}
+    merged = []
+    for hero in sorted(heroes, key=lambda h: h['id']):
+        local = known.get(hero['id'], {})
+        merged.append({
+            "id": hero['id'],
+            "name": hero['localized_name'],
+            "roles": hero.get('roles', local.get("roles", []))
+        })
+
+    version = table["version"] if table else 0
+    if not table or merged != table["heroes"]:
+        version += 1
+    new_table = {
+        "version": version,
+        "updated_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": "OpenDota /heroes",
+        "heroes": merged
+    }
+
+    directory = os.path.dirname(HERO_TABLE_CACHE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_file = f"{HERO_TABLE_CACHE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(new_table, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, HERO_TABLE_CACHE)
+    return new_table
+
+def refresh_hero_table_in_background(table):
+    """在后台线程中刷新英雄数据快照，不阻塞本次运行"""
+    def worker():
+        try:
+            refresh_hero_table(table)
+        except Exception as e:
+            print(f"后台刷新英雄数据失败: {e}")
+
+    thread = threading.Thread(target=worker, name="hero-table-refresh", daemon=True)
+    thread.start()
+    return thread
+
+def get_heroes_map():
+    """
+    获取英雄ID到名称的映射
+    直接使用本地快照（离线可用、结果确定），快照过期时在后台刷新供下次运行使用；
+    只有本地没有任何快照时才会阻塞等待网络
+    """
+    print("正在加载英雄数据...")
+    table = load_hero_table()
+    if table is None:
+        try:
+            table = refresh_hero_table(None)
+        except Exception as e:
+            print(f"获取英雄列表失败: {e}")
+            return {}
+    elif hero_table_is_stale(table):
+        refresh_hero_table_in_background(table)
+
+    hero_map = {hero['id']: hero['name'] for hero in table["heroes"]}
+    print(f"英雄数据快照 v{table['version']} ({table['updated_at']})，共 {len(hero_map)} 个英雄")
+    return hero_map
 
 # ============== 玩家数据获取 ==============
 
 def get_player_info(account_id):
     """获取玩家基本信息"""
-    url = f"{BASE_URL}/players/{account_id}"
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return response.json()
+        return api_get(f"/players/{account_id}", ttl=CACHE_TTL["player"])
     except Exception as e:
         print(f"  获取玩家信息失败: {e}")
         return None
 
-def get_player_matches(account_id, limit=100):
-    """获取玩家最近的比赛记录"""
-    url = f"{BASE_URL}/players/{account_id}/matches"
-    params = {"limit": limit}
+def get_player_matches(account_id, limit=100, offset=0, filters=None):
+    """
+    获取玩家最近的比赛记录
+    只请求 MATCH_FIELDS 中的字段；filters 为服务端过滤参数，如
+    {"lobby_type": 7, "game_mode": 22, "date": 30}（date 为最近天数）
+    请求失败时返回 None，以便与没有更多比赛的空页区分
+    """
+    params = {"limit": limit, "project": MATCH_FIELDS}
+    if offset:
+        params["offset"] = offset
+    if filters:
+        params.update(filters)
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        return response.json()
+        return api_get(f"/players/{account_id}/matches", params, ttl=CACHE_TTL["matches"])
     except Exception as e:
         print(f"  获取比赛记录失败: {e}")
-        return []
+        return None
+
+def stream_player_matches(account_id, limit=100, offset=0, filters=None):
+    """
+    get_player_matches 的流式版本：边接收响应边逐场产出比赛记录，不整体解析响应
+    请求失败或响应中途断开时抛出异常，调用方据此知道已产出的比赛不完整
+    """
+    params = {"limit": limit, "project": MATCH_FIELDS}
+    if offset:
+        params["offset"] = offset
+    if filters:
+        params.update(filters)
+    yield from api_stream(f"/players/{account_id}/matches", params)
+
+# ============== 增量比赛同步 ==============
+
+class MatchStore:
+    """
+    按玩家保存最近一次同步的比赛窗口（SQLite）
+    记录最新的 match_id / start_time，下次只需请求此后的新比赛
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.downloaded = 0  # 实际从API下载的比赛数
+        self.reused = 0      # 直接复用本地窗口的比赛数
+        self.conn = open_sqlite(
+            path,
+            "CREATE TABLE IF NOT EXISTS match_windows ("
+            "window_key TEXT PRIMARY KEY, window_limit INTEGER NOT NULL, "
+            "newest_match_id INTEGER, newest_start_time INTEGER, "
+            "matches TEXT NOT NULL, synced_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def make_key(account_id, filters=None):
+        """比赛窗口键：不同的过滤条件各自保存一个窗口"""
+        if not filters:
+            return str(account_id)
+        return f"{account_id}?{json.dumps(filters, sort_keys=True)}"
+
+    def load(self, account_id, filters=None):
+        """读取玩家的比赛窗口，不存在返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT window_limit, matches, synced_at FROM match_windows WHERE window_key = ?",
+                (self.make_key(account_id, filters),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"limit": row[0], "matches": json.loads(row[1]), "synced_at": row[2]}
+
+    def save(self, account_id, limit, matches, filters=None):
+        """保存玩家的比赛窗口（按时间倒序）"""
+        newest = matches[0] if matches else {}
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO match_windows "
+                "(window_key, window_limit, newest_match_id, newest_start_time, matches, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.make_key(account_id, filters), limit, newest.get('match_id'), newest.get('start_time'),
+                 json.dumps(matches, ensure_ascii=False), time.time())
+            )
+            self.conn.commit()
+
+    def touch(self, account_id, filters=None):
+        """同步后没有新比赛时只更新同步时间"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE match_windows SET synced_at = ? WHERE window_key = ?",
+                (time.time(), self.make_key(account_id, filters))
+            )
+            self.conn.commit()
+
+    def record(self, downloaded, reused):
+        with self.lock:
+            self.downloaded += downloaded
+            self.reused += reused
+
+    def summary(self):
+        """增量同步统计"""
+        total = self.downloaded + self.reused
+        saved = round(self.reused / total * 100, 1) if total else 0
+        return f"增量同步: 下载 {self.downloaded} 场 / 复用本地 {self.reused} 场 (节省 {saved}%)"
+
+# 由入口按命令行参数创建；为 None 时每次都完整下载比赛窗口
+match_store = None
+
+def sync_player_matches(account_id, limit=MATCHES_LIMIT, filters=None):
+    """
+    增量同步玩家最近 limit 场比赛
+    从最新一场开始分页请求（页大小逐页翻倍），遇到本地已有的比赛即停止，
+    再与本地窗口合并截断为 limit 场；
+    响应缓存设置了 max_age 且本地窗口在该时间内同步过时，直接使用本地窗口，不发请求。
+    任一页请求失败时使用本地窗口，且不更新窗口与同步时间，下次运行重新同步
+    """
+    store = match_store
+    stored = store.load(account_id, filters) if store is not None else None
+
+    if stored is None or stored["limit"] < limit:
+        matches = get_player_matches(account_id, limit, filters=filters) or []
+        if store is not None and matches:
+            store.save(account_id, limit, matches, filters)
+            store.record(len(matches), 0)
+        return matches
+
+    stored_matches = stored["matches"]
+    if filters and filters.get("date"):
+        # date 是相对当前时间的天数，本地窗口中已滑出范围的比赛不能再合并回来
+        since = time.time() - filters["date"] * 86400
+        stored_matches = [m for m in stored_matches if m.get('start_time', 0) >= since]
+
+    cache = response_cache
+    if cache is not None and cache.max_age is not None and time.time() - stored["synced_at"] <= cache.max_age:
+        merged = stored_matches[:limit]
+        store.record(0, len(merged))
+        return merged
+
+    known_ids = {m.get('match_id') for m in stored_matches}
+    new_matches = []
+    offset = 0
+    page_size = SYNC_PAGE_SIZE
+    reached_known = False
+    while offset < limit and not reached_known:
+        page = get_player_matches(account_id, min(page_size, limit - offset), offset, filters)
+        if page is None:
+            # 已下载的新比赛与本地窗口之间可能有缺口，合并后以后的同步也补不回来
+            merged = stored_matches[:limit]
+            store.record(0, len(merged))
+            return merged
+        for match in page:
+            if match.get('match_id') in known_ids:
+                reached_known = True
+                break
+            new_matches.append(match)
+        if len(page) < page_size:
+            break
+        offset += len(page)
+        page_size *= 2
+
+    merged = (new_matches + stored_matches)[:limit]
+    store.record(len(new_matches), len(merged) - len(new_matches))
+    if new_matches or len(stored_matches) < len(stored["matches"]):
+        store.save(account_id, limit, merged, filters)
+    else:
+        store.touch(account_id, filters)
+    return merged
+
+# ============== 深度历史 ==============
+
+def iter_match_history(account_id, limit, filters=None, page_size=DEEP_PAGE_SIZE):
+    """
+    按 offset/limit 分页下载玩家最近 limit 场比赛，逐场产出（按时间倒序）
+    每页响应都流式解析（见 stream_player_matches），内存中只保留当前一场比赛和一个读取块。
+    翻页期间玩家打完新比赛会使后续页整体后移，按 match_id 跳过已产出过的比赛；
+    任一页请求失败时抛出异常
+    """
+    offset = 0
+    oldest_id = None
+    while offset < limit:
+        requested = min(page_size, limit - offset)
+        received = 0
+        for match in stream_player_matches(account_id, requested, offset, filters):
+            received += 1
+            match_id = match.get('match_id', 0)
+            if oldest_id is None or match_id < oldest_id:
+                oldest_id = match_id
+                yield match
+        if received < requested:
+            break
+        offset += requested
 
 # ============== 位置分析 ==============
 
@@ -292,48 +874,31 @@ def analyze_position(hero_usage):
 
 # ============== 状态趋势分析 ==============
 
-def analyze_trend(matches, hero_map):
-    """分析近期状态趋势 (最近20场 vs 前80场)"""
-    if len(matches) < 20:
-        return None
+TREND_RECENT_GAMES = 20  # 近期状态窗口：最近20场 vs 其余场次
 
-    recent_matches = matches[:20]
-    older_matches = matches[20:] if len(matches) > 20 else []
+def new_counter():
+    """单个统计桶：场次、胜场与KDA累计"""
+    return {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0}
 
-    def calc_stats(match_list):
-        if not match_list:
-            return None
-        wins = 0
-        total_kills = 0
-        total_deaths = 0
-        total_assists = 0
-
-        for match in match_list:
-            player_slot = match.get('player_slot', 0)
-            radiant_win = match.get('radiant_win', False)
-            is_radiant = player_slot < 128
-            won = (is_radiant and radiant_win) or (not is_radiant and not radiant_win)
-            if won:
-                wins += 1
-
-            total_kills += match.get('kills', 0) or 0
-            total_deaths += match.get('deaths', 0) or 0
-            total_assists += match.get('assists', 0) or 0
-
-        count = len(match_list)
-        kda = round((total_kills + total_assists) / max(total_deaths, 1), 2)
-        return {
-            "games": count,
-            "wins": wins,
-            "win_rate": round(wins / count * 100, 1),
-            "avg_kills": round(total_kills / count, 1),
-            "avg_deaths": round(total_deaths / count, 1),
-            "avg_assists": round(total_assists / count, 1),
-            "kda": kda
-        }
+def summarize_window(window):
+    """由统计桶计算一个时间窗口的胜率与KDA"""
+    count = window["games"]
+    if not count:
+        return None
+    return {
+        "games": count,
+        "wins": window["wins"],
+        "win_rate": round(window["wins"] / count * 100, 1),
+        "avg_kills": round(window["kills"] / count, 1),
+        "avg_deaths": round(window["deaths"] / count, 1),
+        "avg_assists": round(window["assists"] / count, 1),
+        "kda": round((window["kills"] + window["assists"]) / max(window["deaths"], 1), 2)
+    }
 
-    recent_stats = calc_stats(recent_matches)
-    older_stats = calc_stats(older_matches) if older_matches else None
+def build_trend_analysis(recent_window, older_window):
+    """由近期/早期两个统计桶生成趋势分析结果"""
+    recent_stats = summarize_window(recent_window)
+    older_stats = summarize_window(older_window)
 
     # 计算趋势
     trend = {
@@ -365,51 +930,27 @@ def analyze_trend(matches, hero_map):
 
     return trend
 
-# ============== 对局时长分析 ==============
-
-def analyze_game_duration(matches, hero_map):
-    """分析不同时长对局的表现"""
-    duration_stats = {
-        "early": {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0},  # <30分钟
-        "mid": {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0},    # 30-45分钟
-        "late": {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0}    # >45分钟
-    }
-
-    for match in matches:
-        duration = match.get('duration', 0) / 60  # 转换为分钟
+def match_outcome(match):
+    """解码单场比赛：返回 (是否获胜, 击杀, 死亡, 助攻)"""
+    won = (match.get('player_slot', 0) < 128) == bool(match.get('radiant_win', False))
+    return (won, match.get('kills', 0) or 0, match.get('deaths', 0) or 0, match.get('assists', 0) or 0)
 
-        if duration < 30:
-            category = "early"
-        elif duration <= 45:
-            category = "mid"
-        else:
-            category = "late"
-
-        player_slot = match.get('player_slot', 0)
-        radiant_win = match.get('radiant_win', False)
-        is_radiant = player_slot < 128
-        won = (is_radiant and radiant_win) or (not is_radiant and not radiant_win)
+# ============== 对局时长分析 ==============
 
-        duration_stats[category]["games"] += 1
-        if won:
-            duration_stats[category]["wins"] += 1
-        duration_stats[category]["kills"] += match.get('kills', 0) or 0
-        duration_stats[category]["deaths"] += match.get('deaths', 0) or 0
-        duration_stats[category]["assists"] += match.get('assists', 0) or 0
+DURATION_LABELS = {
+    "early": "早期(<30分钟)",
+    "mid": "中期(30-45分钟)",
+    "late": "后期(>45分钟)"
+}
 
-    # 计算各时段的统计数据
+def build_duration_analysis(duration_stats):
+    """由各时段统计桶生成时长分析结果"""
     result = {}
-    labels = {
-        "early": "早期(<30分钟)",
-        "mid": "中期(30-45分钟)",
-        "late": "后期(>45分钟)"
-    }
-
     for period, stats in duration_stats.items():
         games = stats["games"]
         if games > 0:
             result[period] = {
-                "label": labels[period],
+                "label": DURATION_LABELS[period],
                 "games": games,
                 "wins": stats["wins"],
                 "win_rate": round(stats["wins"] / games * 100, 1),
@@ -417,7 +958,7 @@ def analyze_game_duration(matches, hero_map):
             }
         else:
             result[period] = {
-                "label": labels[period],
+                "label": DURATION_LABELS[period],
                 "games": 0,
                 "wins": 0,
                 "win_rate": 0,
@@ -427,110 +968,574 @@ def analyze_game_duration(matches, hero_map):
     # 找出最强时段
     best_period = max(result.keys(), key=lambda x: result[x]["win_rate"] if result[x]["games"] >= 5 else 0)
     result["best_period"] = best_period
-    result["best_period_label"] = labels[best_period]
+    result["best_period_label"] = DURATION_LABELS[best_period]
 
     return result
 
 # ============== 综合数据分析 ==============
 
-def analyze_matches(matches, hero_map):
-    """分析比赛数据（增强版）"""
+# stats["hero_usage"] 中每个英雄一行计数的列顺序
+HERO_USAGE_FIELDS = ("games", "wins", "kills", "deaths", "assists")
+
+def hero_display_name(hero_map, hero_id):
+    """英雄ID转显示名称，未知英雄显示为 Unknown(id)"""
+    name = hero_map.get(hero_id)
+    return name if name is not None else f"Unknown({hero_id})"
+
+def hero_usage_by_name(hero_usage, hero_map):
+    """把按 hero_id 存放的英雄计数展开为 {英雄名: {games, wins, ...}}（用于报告/位置分析）"""
+    named = {}
+    for hero_id, row in hero_usage.items():
+        name = hero_map.get(hero_id)
+        if name is None:
+            name = hero_display_name(hero_map, int(hero_id))  # 从JSON读回时键为字符串
+        counter = named.get(name)
+        if counter is None:
+            named[name] = dict(zip(HERO_USAGE_FIELDS, row))
+        else:
+            # 多个 hero_id 对应同一名称时合并
+            for field, value in zip(HERO_USAGE_FIELDS, row):
+                counter[field] += value
+    return named
+
+def restore_hero_usage(stats):
+    """
+    还原从JSON读回的 stats["hero_usage"]：JSON 对象的键总是字符串，改回 hero_id 整数键。
+    早期快照按英雄名存放 {英雄名: {games, wins, ...}}，原样保留（报告不读取 hero_usage）。
+    """
+    hero_usage = stats.get("hero_usage")
+    if hero_usage and all(key.isdigit() for key in hero_usage):
+        stats["hero_usage"] = {int(hero_id): counts for hero_id, counts in hero_usage.items()}
+
+class MatchAccumulator:
+    """
+    流式比赛统计：比赛可以分多页依次 add()，每场只解码一次，同时累计整体数据、
+    英雄使用、近期趋势窗口和对局时长分段，最后 summarize() 统一汇总。
+    只保存计数而不保存比赛本身，内存占用与比赛场数无关。
+    英雄计数按 hero_id 下标存放在定长列表中，英雄名只在汇总时解析
+    """
+
+    def __init__(self, hero_map):
+        self.hero_map = hero_map
+        self.games = self.wins = self.kills = self.deaths = self.assists = 0
+        slots = max(hero_map, default=0) + 1
+        self.hero_columns = [[0] * slots for _ in HERO_USAGE_FIELDS]
+        self.hero_order = []  # 英雄首次出现的顺序
+        self.recent_records = []  # 最近10场的原始记录，需要时再生成 recent_matches
+        # 近期窗口与早期、中期时段的计数，列顺序同 HERO_USAGE_FIELDS；
+        # 前期窗口 = 总计 - 近期窗口，后期时段 = 总计 - 早期 - 中期，汇总时再推算。
+        # 热循环中只累加局部整数，不按键更新字典
+        self.recent_counts = [0] * len(HERO_USAGE_FIELDS)
+        self.early_counts = [0] * len(HERO_USAGE_FIELDS)
+        self.mid_counts = [0] * len(HERO_USAGE_FIELDS)
+
+    def add(self, matches):
+        """累计一批比赛（列表或逐场产出的迭代器），须按时间倒序依次传入"""
+        hero_games, hero_wins, hero_kills, hero_deaths, hero_assists = self.hero_columns
+        slots = len(hero_games)
+        hero_order = self.hero_order
+        recent_records = self.recent_records
+        last_recent = TREND_RECENT_GAMES - 1
+        early_games, early_wins, early_kills, early_deaths, early_assists = self.early_counts
+        mid_games, mid_wins, mid_kills, mid_deaths, mid_assists = self.mid_counts
+        wins, total_kills, total_deaths, total_assists = self.wins, self.kills, self.deaths, self.assists
+
+        index = self.games - 1
+        try:
+            for index, match in enumerate(matches, self.games):
+                hero_id = match.get('hero_id', 0)
+                won = (match.get('player_slot', 0) < 128) == bool(match.get('radiant_win', False))
+                kills = match.get('kills', 0) or 0
+                deaths = match.get('deaths', 0) or 0
+                assists = match.get('assists', 0) or 0
+                minutes = match.get('duration', 0) / 60
+
+                total_kills += kills
+                total_deaths += deaths
+                total_assists += assists
+
+                if hero_id >= slots:
+                    grow = hero_id + 1 - slots
+                    for column in self.hero_columns:
+                        column.extend([0] * grow)
+                    slots = hero_id + 1
+                if not hero_games[hero_id]:
+                    hero_order.append(hero_id)
+
+                hero_games[hero_id] += 1
+                if won:
+                    wins += 1
+                    hero_wins[hero_id] += 1
+                hero_kills[hero_id] += kills
+                hero_deaths[hero_id] += deaths
+                hero_assists[hero_id] += assists
+
+                if minutes < 30:
+                    early_games += 1
+                    early_wins += won
+                    early_kills += kills
+                    early_deaths += deaths
+                    early_assists += assists
+                elif minutes <= 45:
+                    mid_games += 1
+                    mid_wins += won
+                    mid_kills += kills
+                    mid_deaths += deaths
+                    mid_assists += assists
+
+                if index < 10:
+                    recent_records.append(match)
+                if index == last_recent:
+                    self.recent_counts = [index + 1, wins, total_kills, total_deaths, total_assists]
+        finally:
+            # 迭代器中途抛出异常（如下载失败）时，已累计的比赛仍然保持一致
+            self.games = index + 1
+            self.wins, self.kills, self.deaths, self.assists = wins, total_kills, total_deaths, total_assists
+            self.early_counts = [early_games, early_wins, early_kills, early_deaths, early_assists]
+            self.mid_counts = [mid_games, mid_wins, mid_kills, mid_deaths, mid_assists]
+
+    def summarize(self, fields=None):
+        """生成 stats 结构（fields 见 summarize_matches），还没有累计任何比赛时返回 None"""
+        if not self.games:
+            return None
+        total_counts = [self.games, self.wins, self.kills, self.deaths, self.assists]
+        totals = dict(zip(HERO_USAGE_FIELDS, total_counts))
+        recent_counts = self.recent_counts if self.games >= TREND_RECENT_GAMES else total_counts
+        late_counts = [total - early - mid for total, early, mid
+                       in zip(total_counts, self.early_counts, self.mid_counts)]
+        recent_window = dict(zip(HERO_USAGE_FIELDS, recent_counts))
+        older_window = {field: total - recent for field, total, recent
+                        in zip(HERO_USAGE_FIELDS, total_counts, recent_counts)}
+        duration_stats = {period: dict(zip(HERO_USAGE_FIELDS, counts)) for period, counts
+                          in zip(DURATION_LABELS, (self.early_counts, self.mid_counts, late_counts))}
+        games, wins, kills, deaths, assists = self.hero_columns
+        hero_usage = {hero_id: [games[hero_id], wins[hero_id], kills[hero_id], deaths[hero_id], assists[hero_id]]
+                      for hero_id in self.hero_order}
+        return summarize_matches(totals, hero_usage, self.hero_map, self.recent_records,
+                                 recent_window, older_window, duration_stats, fields)
+
+def analyze_matches(matches, hero_map, fields=None):
+    """分析比赛数据（增强版），一次性传入全部比赛的 MatchAccumulator"""
     if not matches:
         return None
+    accumulator = MatchAccumulator(hero_map)
+    accumulator.add(matches)
+    return accumulator.summarize(fields)
+
+def recent_matches_list(recent_records, hero_map):
+    """最近比赛列表（最近10场）"""
+    return [
+        recent_match_entry(match, hero_display_name(hero_map, match.get('hero_id', 0)), *match_outcome(match))
+        for match in recent_records
+    ]
+
+def recent_match_entry(match, hero_name, won, kills, deaths, assists):
+    """最近比赛列表中的一项"""
+    return {
+        "match_id": match.get('match_id'),
+        "hero": hero_name,
+        "kda": f"{kills}/{deaths}/{assists}",
+        "won": won,
+        "duration": match.get('duration', 0) // 60,
+        "start_time": datetime.fromtimestamp(match.get('start_time', 0)).strftime('%Y-%m-%d %H:%M') if match.get('start_time') else "N/A"
+    }
 
-    stats = {
-        "total_matches": len(matches),
-        "wins": 0,
-        "losses": 0,
-        "total_kills": 0,
-        "total_deaths": 0,
-        "total_assists": 0,
-        "hero_usage": defaultdict(lambda: {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0}),
-        "recent_matches": []
+def overall_stats(totals):
+    """整体战绩：场次、胜负、总KDA及场均数据"""
+    total = totals["games"]
+    wins = totals["wins"]
+    total_kills = totals["kills"]
+    total_deaths = totals["deaths"]
+    total_assists = totals["assists"]
+
+    overall = {
+        "total_matches": total,
+        "wins": wins,
+        "losses": total - wins,
+        "total_kills": total_kills,
+        "total_deaths": total_deaths,
+        "total_assists": total_assists,
+        "avg_kills": round(total_kills / total, 2),
+        "avg_deaths": round(total_deaths / total, 2),
+        "avg_assists": round(total_assists / total, 2),
+        "win_rate": round(wins / total * 100, 2),
     }
+    if total_deaths > 0:
+        overall["kda_ratio"] = round((total_kills + total_assists) / total_deaths, 2)
+    else:
+        overall["kda_ratio"] = total_kills + total_assists
+    return overall
+
+def top_heroes(hero_usage, hero_map):
+    """使用场次最多的10个英雄"""
+    sorted_heroes = sorted(hero_usage.items(), key=lambda x: x[1][0], reverse=True)
+    result = []
+    for hero_id, (games, hero_wins, kills, deaths, assists) in sorted_heroes[:10]:
+        win_rate = round(hero_wins / games * 100, 2) if games > 0 else 0
+        avg_kda = f"{round(kills/games, 1)}/{round(deaths/games, 1)}/{round(assists/games, 1)}" if games > 0 else "0/0/0"
+
+        result.append({
+            "hero": hero_display_name(hero_map, hero_id),
+            "games": games,
+            "wins": hero_wins,
+            "win_rate": win_rate,
+            "avg_kda": avg_kda
+        })
+    return result
 
-    for match in matches:
-        hero_id = match.get('hero_id', 0)
-        hero_name = hero_map.get(hero_id, f"Unknown({hero_id})")
+def trend_from_windows(totals, recent_window, older_window):
+    """近期状态趋势，不足 TREND_RECENT_GAMES 场时为 None"""
+    if totals["games"] < TREND_RECENT_GAMES:
+        return None
+    return build_trend_analysis(recent_window, older_window)
+
+# 分析注册表：名称 -> (输入, 计算函数)
+# 输入可以是分析后端累计好的统计桶（ANALYSIS_INPUTS），也可以是其他分析的结果。
+# 新增分析只需在这里登记，复用已有的中间结果，不需要再遍历比赛
+ANALYSIS_INPUTS = ("hero_map", "totals", "hero_usage", "recent_records",
+                   "recent_window", "older_window", "duration_stats")
+ANALYZERS = {
+    "overall": (("totals",), overall_stats),
+    "recent_matches": (("recent_records", "hero_map"), recent_matches_list),
+    "hero_usage_by_name": (("hero_usage", "hero_map"), hero_usage_by_name),
+    "top_heroes": (("hero_usage", "hero_map"), top_heroes),
+    "position_analysis": (("hero_usage_by_name",), analyze_position),
+    "trend_analysis": (("totals", "recent_window", "older_window"), trend_from_windows),
+    "duration_analysis": (("duration_stats",), build_duration_analysis),
+}
 
-        player_slot = match.get('player_slot', 0)
-        radiant_win = match.get('radiant_win', False)
-        is_radiant = player_slot < 128
-        won = (is_radiant and radiant_win) or (not is_radiant and not radiant_win)
+# stats 中的字段（按输出顺序）-> 提供该字段的分析；字段名与分析名不同时取该分析结果中的同名项
+STATS_FIELDS = {
+    "total_matches": "overall",
+    "wins": "overall",
+    "losses": "overall",
+    "total_kills": "overall",
+    "total_deaths": "overall",
+    "total_assists": "overall",
+    "hero_usage": "hero_usage",
+    "recent_matches": "recent_matches",
+    "avg_kills": "overall",
+    "avg_deaths": "overall",
+    "avg_assists": "overall",
+    "win_rate": "overall",
+    "kda_ratio": "overall",
+    "top_heroes": "top_heroes",
+    "position_analysis": "position_analysis",
+    "trend_analysis": "trend_analysis",
+    "duration_analysis": "duration_analysis",
+}
 
-        if won:
-            stats["wins"] += 1
-            stats["hero_usage"][hero_name]["wins"] += 1
-        else:
-            stats["losses"] += 1
+class AnalysisContext:
+    """单个玩家的分析上下文：按依赖关系惰性计算，每个中间结果只计算一次"""
 
-        kills = match.get('kills', 0) or 0
-        deaths = match.get('deaths', 0) or 0
-        assists = match.get('assists', 0) or 0
+    def __init__(self, inputs):
+        self.values = dict(inputs)
 
-        stats["total_kills"] += kills
-        stats["total_deaths"] += deaths
-        stats["total_assists"] += assists
+    def get(self, name):
+        if name not in self.values:
+            dependencies, compute = ANALYZERS[name]
+            self.values[name] = compute(*(self.get(dependency) for dependency in dependencies))
+        return self.values[name]
 
-        stats["hero_usage"][hero_name]["games"] += 1
-        stats["hero_usage"][hero_name]["kills"] += kills
-        stats["hero_usage"][hero_name]["deaths"] += deaths
-        stats["hero_usage"][hero_name]["assists"] += assists
+def summarize_matches(totals, hero_usage, hero_map, recent_records, recent_window, older_window, duration_stats,
+                      fields=None):
+    """
+    由累计好的统计桶生成 analyze_matches 的 stats 结构（各分析后端共用）
+    hero_usage 为 {hero_id: [场次, 胜场, 击杀, 死亡, 助攻]}，按首次出现顺序排列，
+    recent_records 为最近10场的原始比赛记录。
+    fields 为需要的 stats 字段（None 为全部），只计算这些字段依赖的分析
+    """
+    context = AnalysisContext(zip(ANALYSIS_INPUTS, (
+        hero_map, totals, hero_usage, recent_records, recent_window, older_window, duration_stats
+    )))
+    stats = {}
+    for field, source in STATS_FIELDS.items():
+        if fields is None or field in fields:
+            value = context.get(source)
+            stats[field] = value if source == field else value[field]
+    return stats
 
-        if len(stats["recent_matches"]) < 10:
-            stats["recent_matches"].append({
-                "match_id": match.get('match_id'),
-                "hero": hero_name,
-                "kda": f"{kills}/{deaths}/{assists}",
-                "won": won,
-                "duration": match.get('duration', 0) // 60,
-                "start_time": datetime.fromtimestamp(match.get('start_time', 0)).strftime('%Y-%m-%d %H:%M') if match.get('start_time') else "N/A"
-            })
+# ============== NumPy 列式分析后端 ==============
 
-    # 计算基础统计
-    total = stats["total_matches"]
-    if total > 0:
-        stats["avg_kills"] = round(stats["total_kills"] / total, 2)
-        stats["avg_deaths"] = round(stats["total_deaths"] / total, 2)
-        stats["avg_assists"] = round(stats["total_assists"] / total, 2)
-        stats["win_rate"] = round(stats["wins"] / total * 100, 2)
+def matches_to_columns(matches):
+    """把比赛记录列表转换为列式数组：英雄、胜负、KDA、时长、开始时间"""
+    count = len(matches)
+    radiant = np.fromiter((m.get('player_slot', 0) < 128 for m in matches), dtype=bool, count=count)
+    radiant_win = np.fromiter((bool(m.get('radiant_win', False)) for m in matches), dtype=bool, count=count)
+    return {
+        "hero_id": np.fromiter((m.get('hero_id', 0) for m in matches), dtype=np.int64, count=count),
+        "win": radiant == radiant_win,
+        "kills": np.fromiter((m.get('kills', 0) or 0 for m in matches), dtype=np.int64, count=count),
+        "deaths": np.fromiter((m.get('deaths', 0) or 0 for m in matches), dtype=np.int64, count=count),
+        "assists": np.fromiter((m.get('assists', 0) or 0 for m in matches), dtype=np.int64, count=count),
+        "duration": np.fromiter((m.get('duration', 0) for m in matches), dtype=np.float64, count=count),
+        "start_time": np.fromiter((m.get('start_time', 0) or 0 for m in matches), dtype=np.int64, count=count),
+    }
 
-        if stats["total_deaths"] > 0:
-            stats["kda_ratio"] = round((stats["total_kills"] + stats["total_assists"]) / stats["total_deaths"], 2)
-        else:
-            stats["kda_ratio"] = stats["total_kills"] + stats["total_assists"]
-
-    # 排序英雄
-    sorted_heroes = sorted(stats["hero_usage"].items(), key=lambda x: x[1]["games"], reverse=True)
-    stats["top_heroes"] = []
-    for hero_name, hero_stats in sorted_heroes[:10]:
-        games = hero_stats["games"]
-        wins = hero_stats["wins"]
-        win_rate = round(wins / games * 100, 2) if games > 0 else 0
-        avg_kda = f"{round(hero_stats['kills']/games, 1)}/{round(hero_stats['deaths']/games, 1)}/{round(hero_stats['assists']/games, 1)}" if games > 0 else "0/0/0"
-
-        stats["top_heroes"].append({
-            "hero": hero_name,
-            "games": games,
-            "wins": wins,
-            "win_rate": win_rate,
-            "avg_kda": avg_kda
-        })
+def counter_from_columns(columns, selector=slice(None)):
+    """对列式数组的一个切片求和，得到一个统计桶"""
+    return {
+        "games": int(columns["win"][selector].size),
+        "wins": int(np.count_nonzero(columns["win"][selector])),
+        "kills": int(columns["kills"][selector].sum()),
+        "deaths": int(columns["deaths"][selector].sum()),
+        "assists": int(columns["assists"][selector].sum()),
+    }
+
+def grouped_counters(codes, columns, group_count):
+    """按分组编号做向量化 group-by（bincount），返回每组一个统计桶"""
+    sums = {
+        "games": np.bincount(codes, minlength=group_count),
+        "wins": np.bincount(codes, weights=columns["win"], minlength=group_count),
+        "kills": np.bincount(codes, weights=columns["kills"], minlength=group_count),
+        "deaths": np.bincount(codes, weights=columns["deaths"], minlength=group_count),
+        "assists": np.bincount(codes, weights=columns["assists"], minlength=group_count),
+    }
+    return [{key: int(values[group]) for key, values in sums.items()} for group in range(group_count)]
+
+def analyze_columns(columns, hero_map, recent_records, fields=None):
+    """基于列式数组的向量化分析，返回与 analyze_matches 相同的 stats 结构"""
+    # 英雄使用：按首次出现顺序排列，与逐场累计的插入顺序一致
+    hero_ids, first_index, codes = np.unique(columns["hero_id"], return_index=True, return_inverse=True)
+    hero_counters = grouped_counters(codes.ravel(), columns, len(hero_ids))
+    hero_usage = {
+        int(hero_ids[group]): [hero_counters[group][field] for field in HERO_USAGE_FIELDS]
+        for group in np.argsort(first_index, kind="stable")
+    }
 
-    # 新增分析
-    stats["position_analysis"] = analyze_position(stats["hero_usage"])
-    stats["trend_analysis"] = analyze_trend(matches, hero_map)
-    stats["duration_analysis"] = analyze_game_duration(matches, hero_map)
+    # 对局时长分段：0=早期 1=中期 2=后期
+    minutes = columns["duration"] / 60
+    periods = np.where(minutes < 30, 0, np.where(minutes <= 45, 1, 2))
+    duration_stats = dict(zip(DURATION_LABELS, grouped_counters(periods, columns, 3)))
+
+    return summarize_matches(
+        counter_from_columns(columns),
+        hero_usage,
+        hero_map,
+        recent_records,
+        counter_from_columns(columns, slice(None, TREND_RECENT_GAMES)),
+        counter_from_columns(columns, slice(TREND_RECENT_GAMES, None)),
+        duration_stats,
+        fields,
+    )
+
+def analyze_matches_numpy(matches, hero_map, fields=None):
+    """analyze_matches 的 NumPy 后端：先转换为列式数组再做向量化统计"""
+    if not matches:
+        return None
+    if np is None:
+        raise RuntimeError("NumPy 后端需要安装 numpy: pip install numpy")
 
-    # 转换defaultdict为普通dict，确保JSON序列化正常
-    stats["hero_usage"] = dict(stats["hero_usage"])
+    return analyze_columns(matches_to_columns(matches), hero_map, matches[:10], fields)
 
-    return stats
+# 可选的分析后端（--backend）
+ANALYSIS_BACKENDS = {
+    "python": analyze_matches,
+    "numpy": analyze_matches_numpy,
+}
+
+# ============== 断点续传 ==============
+
+class CheckpointStore:
+    """
+    每名玩家抓取、分析完成后立即保存原始响应与分析结果（SQLite），
+    中断后用 --resume 重新运行时跳过新鲜度窗口内已完成的玩家
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = open_sqlite(
+            path,
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "player_key TEXT PRIMARY KEY, player_info TEXT, matches TEXT NOT NULL, "
+            "result TEXT NOT NULL, match_count INTEGER NOT NULL, completed_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def make_key(account_id, filters=None, depth=None):
+        """检查点键：过滤条件和深度历史场数不同的结果各自保存"""
+        key = MatchStore.make_key(account_id, filters)
+        return f"{key}#deep={depth}" if depth else key
+
+    def save(self, account_id, filters, player_info, matches, player_data, match_count, depth=None):
+        """保存一名玩家的原始响应和分析结果（深度历史模式不保存比赛记录，matches 为空）"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(player_key, player_info, matches, result, match_count, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.make_key(account_id, filters, depth),
+                 json.dumps(player_info, ensure_ascii=False),
+                 json.dumps(matches, ensure_ascii=False),
+                 json.dumps(player_data, ensure_ascii=False, default=str),
+                 match_count, time.time())
+            )
+            self.conn.commit()
+
+    def load(self, account_id, filters, max_age, depth=None):
+        """读取 max_age 秒内完成的检查点，返回 (玩家结果, 比赛场数, 完成时间)，没有则返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result, match_count, completed_at FROM checkpoints WHERE player_key = ?",
+                (self.make_key(account_id, filters, depth),)
+            ).fetchone()
+        if row is None or time.time() - row[2] > max_age:
+            return None
+        player_data = json.loads(row[0])
+        if player_data.get("stats"):
+            restore_hero_usage(player_data["stats"])
+        return player_data, row[1], row[2]
+
+# 由入口创建；为 None 时不保存检查点
+checkpoint_store = None
+
+# ============== 分析进程池 ==============
+
+# 分析子进程中的英雄映射，由进程池的 initializer 设置一次，不随每个任务传输
+worker_hero_map = None
+
+def init_analysis_worker(hero_map):
+    """分析子进程初始化"""
+    global worker_hero_map
+    worker_hero_map = hero_map
+
+def analyze_in_worker(backend, matches, fields=None):
+    """在分析子进程中运行比赛分析（含位置、趋势、时长分析）"""
+    return ANALYSIS_BACKENDS[backend](matches, worker_hero_map, fields)
 
 # ============== 主程序 ==============
 
-def fetch_all_players_data():
-    """获取所有玩家数据"""
+def fetch_player_raw(account_id, filters=None):
+    """
+    获取单个玩家的信息与最近比赛记录，返回 (玩家信息, 比赛列表)
+    两者互不依赖：信息请求在后台线程中与比赛同步同时进行，都经过全局限流器
+    """
+    with ThreadPoolExecutor(max_workers=1) as profile_executor:
+        player_info_future = profile_executor.submit(get_player_info, account_id)
+        matches = sync_player_matches(account_id, MATCHES_LIMIT, filters)
+        return player_info_future.result(), matches
+
+def fetch_player_deep(account_id, hero_map, filters, deep):
+    """
+    深度历史模式：分页流式下载最近 deep 场比赛，逐场直接累计进 MatchAccumulator，
+    不保留比赛记录（不使用响应缓存）。返回 (玩家信息, 累计器, 是否完整)；
+    下载中途失败时累计器中是已读取的部分比赛
+    """
+    with ThreadPoolExecutor(max_workers=1) as profile_executor:
+        player_info_future = profile_executor.submit(get_player_info, account_id)
+        accumulator = MatchAccumulator(hero_map)
+        complete = True
+        try:
+            accumulator.add(iter_match_history(account_id, deep, filters))
+        except Exception as e:
+            print(f"  获取比赛记录失败（已读取 {accumulator.games} 场）: {e}")
+            complete = False
+        return player_info_future.result(), accumulator, complete
+
+def build_player_data(account_id, player_info, stats, match_count, filters=None, matches=(), deep=None,
+                      checkpoint=True):
+    """
+    由抓取和分析结果组装单个玩家的结果并保存检查点，返回 (玩家结果, 比赛场数)
+    checkpoint 为 False 时（比赛记录不完整）不保存检查点，--resume 时会重新抓取
+    """
+    if not match_count:
+        return {"account_id": account_id, "error": "无法获取数据"}, 0
+    if not stats:
+        return {"account_id": account_id, "error": "数据分析失败"}, match_count
+
+    # 解析段位信息
+    rank_info = None
+    if player_info:
+        rank_tier = player_info.get('rank_tier')
+        leaderboard_rank = player_info.get('leaderboard_rank')
+        computed_mmr = player_info.get('computed_mmr')
+        rank_info = parse_rank_tier(rank_tier, leaderboard_rank, computed_mmr)
+
+    player_data = {
+        "account_id": account_id,
+        "profile": player_info.get('profile', {}) if player_info else {},
+        "rank": rank_info,
+        "stats": stats
+    }
+    if checkpoint and checkpoint_store is not None:
+        checkpoint_store.save(account_id, filters, player_info, matches, player_data, match_count, deep)
+    return player_data, match_count
+
+def fetch_player_data(account_id, hero_map, filters=None, backend="python", deep=None, fields=None):
+    """
+    获取并分析单个玩家的数据，返回 (玩家结果, 比赛场数)
+    deep 为场数时使用深度历史模式（见 fetch_player_deep，此时忽略 backend）；
+    fields 为需要计算的 stats 字段（见 summarize_matches）
+    """
+    if deep:
+        player_info, accumulator, complete = fetch_player_deep(account_id, hero_map, filters, deep)
+        stats = accumulator.summarize(fields)
+        return build_player_data(account_id, player_info, stats, accumulator.games, filters, deep=deep,
+                                 checkpoint=complete)
+
+    player_info, matches = fetch_player_raw(account_id, filters)
+    stats = ANALYSIS_BACKENDS[backend](matches, hero_map, fields)
+    return build_player_data(account_id, player_info, stats, len(matches), filters, matches)
+
+def fetch_player_for_pipeline(account_id, filters, backend, fields, analysis_pool):
+    """
+    流水线的抓取阶段：抓取完成后把比赛记录提交到分析进程池的任务队列，不等待分析结束，
+    抓取线程随即处理下一名玩家。分析完成时在回调中组装结果并保存检查点，
+    不必等名单汇总到该玩家，中断后已分析完的玩家都能续传。返回 (玩家结果, 比赛场数) 的 Future
+    """
+    player_info, matches = fetch_player_raw(account_id, filters)
+    built = Future()
+
+    def finish(analysis):
+        if analysis.cancelled():
+            built.cancel()
+            return
+        try:
+            built.set_result(build_player_data(account_id, player_info, analysis.result(),
+                                               len(matches), filters, matches))
+        except Exception as e:
+            built.set_exception(e)
+
+    analysis_pool.submit(analyze_in_worker, backend, matches, fields).add_done_callback(finish)
+    return built
+
+def print_player_result(player_data, match_count):
+    """打印单个玩家的抓取结果"""
+    if player_data.get("error") == "无法获取数据":
+        print(f"  ⚠️ 未能获取到比赛数据")
+        return
+    if "error" in player_data:
+        print(f"  ⚠️ {player_data['error']}")
+        return
+
+    stats = player_data["stats"]
+    rank_info = player_data["rank"]
+    pos = stats["position_analysis"]
+    trend = stats.get("trend_analysis", {})
+    trend_emoji = trend.get("trend_emoji", "➡️") if trend else "➡️"
+
+    rank_display = rank_info.get("display", "未知") if rank_info else "未知"
+    print(f"  ✅ 成功获取 {match_count} 场比赛数据")
+    print(f"     段位: {rank_display}")
+    print(f"     位置: {pos['position_name']} (置信度: {pos['confidence']}%)")
+    print(f"     胜率: {stats['win_rate']}% | KDA: {stats['kda_ratio']} {trend_emoji}")
+    print(f"     招牌: {', '.join([h['hero'] for h in stats['top_heroes'][:3]])}")
+
+def fetch_all_players_data(workers=FETCH_WORKERS, filters=None, backend="python", resume_max_age=None, deep=None,
+                           analysis_workers=ANALYSIS_WORKERS, fields=None):
+    """
+    获取所有玩家数据
+    workers > 1 时多个线程并发抓取，所有请求共享同一个令牌桶限流器；
+    结果始终按 TEAMS 中的顺序组装，与串行抓取完全一致。
+    出现在多个名单位置的账号只抓取一次，结果中以 shared_with 标记。
+    filters 为比赛记录的服务端过滤参数（见 get_player_matches），
+    backend 为分析后端（见 ANALYSIS_BACKENDS）。
+    resume_max_age 不为 None 时复用该秒数内已完成的检查点，只抓取其余玩家；
+    deep 为场数时使用深度历史模式（见 fetch_player_data），结束时输出下载吞吐。
+    analysis_workers > 0 时抓取与分析分为两级流水线：抓取线程只负责下载，
+    比赛记录交给分析进程池，CPU 密集的分析与网络等待重叠并利用多核。
+    fields 为需要计算的 stats 字段（见 stats_fields_for_reports），None 为全部
+    """
     print("=" * 60)
     print("Dota 2 玩家数据分析工具 - 增强版")
     print("=" * 60)
@@ -539,84 +1544,366 @@ def fetch_all_players_data():
     if not hero_map:
         print("警告: 无法获取英雄列表，将使用ID显示")
 
-    time.sleep(REQUEST_DELAY)
+    if filters:
+        print(f"比赛过滤条件: {filters}")
+    if deep:
+        print(f"深度历史模式: 每名玩家最近 {deep} 场比赛（每页 {DEEP_PAGE_SIZE} 场）")
+
+    roster = [
+        (team_data, player_name, account_id)
+        for team_data in TEAMS.values()
+        for player_name, account_id in team_data["players"].items()
+    ]
+
+    # 同一账号可能出现在多个队伍中，每个账号只抓取、分析一次
+    slots_by_account = defaultdict(list)
+    for team_data, player_name, account_id in roster:
+        slots_by_account[account_id].append(f"{team_data['name']}/{player_name}")
+    unique_ids = list(slots_by_account)
+    if len(unique_ids) < len(roster):
+        print(f"\n{len(roster)} 个名单位置对应 {len(unique_ids)} 个不同账号，共用账号只抓取一次")
+
+    fetched = {}
+    resumed = set()
+    if resume_max_age is not None and checkpoint_store is not None:
+        for account_id in unique_ids:
+            checkpoint = checkpoint_store.load(account_id, filters, resume_max_age, deep)
+            # 检查点只算了部分字段时（之前只生成了部分报告）重新抓取
+            stats = checkpoint[0].get("stats") if checkpoint is not None else None
+            if stats is not None and fields is not None and not set(fields) <= stats.keys():
+                checkpoint = None
+            if checkpoint is not None:
+                fetched[account_id] = checkpoint[:2]
+                resumed.add(account_id)
+        print(f"\n断点续传: {len(resumed)} 个账号使用检查点，{len(unique_ids) - len(resumed)} 个账号需要抓取")
+    to_fetch = [account_id for account_id in unique_ids if account_id not in fetched]
+
+    fetch_started = time.time()
+    analysis_pool = None
+    if analysis_workers > 0 and not deep and to_fetch:
+        analysis_pool = ProcessPoolExecutor(max_workers=analysis_workers, initializer=init_analysis_worker,
+                                            initargs=(hero_map,))
+        print(f"\n抓取/分析流水线: {workers} 个抓取线程 + {analysis_workers} 个分析进程")
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = {account_id: executor.submit(fetch_player_for_pipeline, account_id, filters, backend, fields, analysis_pool)
+                   for account_id in to_fetch}
+    elif workers > 1:
+        print(f"\n并发抓取 {len(to_fetch)} 个账号 (线程数: {workers}, 限流: {API_RATE_LIMIT}次/分钟)")
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = {account_id: executor.submit(fetch_player_data, account_id, hero_map, filters, backend, deep, fields)
+                   for account_id in to_fetch}
+    else:
+        executor = None
+        pending = None
 
     all_results = {}
-    total_players = sum(len(team["players"]) for team in TEAMS.values())
-    current = 0
+    reported = set()
+    try:
+        for index, (team_data, player_name, account_id) in enumerate(roster):
+            team_name = team_data["name"]
+            if team_name not in all_results:
+                print(f"\n{'='*60}")
+                print(f"正在处理 {team_name}")
+                print("=" * 60)
+                all_results[team_name] = {"color": team_data["color"], "players": {}}
+
+            print(f"\n[{index + 1}/{len(roster)}] 正在获取 {player_name} (ID: {account_id}) 的数据...")
+            if account_id in reported:
+                print(f"  ↪ 与其他名单位置共用账号，复用已获取的数据")
+            elif account_id in resumed:
+                print(f"  ⏩ 使用检查点（已完成，跳过抓取）")
+            elif analysis_pool is not None:
+                fetched[account_id] = pending[account_id].result().result()
+            elif pending is not None:
+                fetched[account_id] = pending[account_id].result()
+            else:
+                fetched[account_id] = fetch_player_data(account_id, hero_map, filters, backend, deep, fields)
+            player_data, match_count = fetched[account_id]
+
+            # 每个名单位置一份浅拷贝，标记共用该账号的其他位置
+            player_data = dict(player_data)
+            slot = f"{team_name}/{player_name}"
+            shared_with = [s for s in slots_by_account[account_id] if s != slot]
+            if shared_with:
+                player_data["shared_with"] = shared_with
+            player_data["data_hash"] = player_data_hash(player_data)
+
+            all_results[team_name]["players"][player_name] = player_data
+            print_player_result(player_data, match_count)
+            reported.add(account_id)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if analysis_pool is not None:
+            analysis_pool.shutdown(wait=False, cancel_futures=True)
+
+    if deep and to_fetch:
+        elapsed = time.time() - fetch_started
+        downloaded = sum(fetched[account_id][1] for account_id in to_fetch)
+        print(f"\n深度历史: {len(to_fetch)} 个账号共 {downloaded} 场比赛，耗时 {elapsed:.1f} 秒，"
+              f"{downloaded / max(elapsed, 1e-9):.0f} 场/秒")
+    print(f"\n{rate_limiter.summary()}")
+    if response_cache is not None:
+        print(response_cache.summary())
+    if match_store is not None:
+        print(match_store.summary())
 
-    for team_id, team_data in TEAMS.items():
-        team_name = team_data["name"]
-        print(f"\n{'='*60}")
-        print(f"正在处理 {team_name}")
-        print("=" * 60)
+    return all_results, hero_map
 
-        team_results = {
-            "color": team_data["color"],
-            "players": {}
-        }
+# ============== 二进制结果快照 ==============
+
+# 二进制快照（.d2snap）布局：
+#   魔数 | 索引长度(uint32 小端) | zlib(索引JSON) | 每名选手一段 zlib(选手JSON)
+# 索引按原顺序记录队伍的其他字段与每名选手数据段的 (偏移, 长度)，偏移从数据区起点算起，
+# 读取一支队伍或一名选手时只解压对应的数据段
+SNAPSHOT_MAGIC = b"D2SNAP1\n"
+SNAPSHOT_SUFFIX = ".d2snap"
+SNAPSHOT_COMPRESS_LEVEL = 6
+
+def encode_snapshot_blob(obj):
+    """紧凑JSON + zlib 压缩"""
+    text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+    return zlib.compress(text.encode("utf-8"), SNAPSHOT_COMPRESS_LEVEL)
+
+def decode_snapshot_blob(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+def save_binary_snapshot(results, output_file):
+    """把 results 保存为带索引的压缩二进制快照"""
+    index = []
+    blobs = []
+    offset = 0
+    for team_name, team_data in results.items():
+        players = []
+        for player_name, player_data in team_data["players"].items():
+            blob = encode_snapshot_blob(player_data)
+            players.append([player_name, offset, len(blob)])
+            blobs.append(blob)
+            offset += len(blob)
+        extra = {key: value for key, value in team_data.items() if key != "players"}
+        index.append({"name": team_name, "team": extra, "players": players})
+    header = encode_snapshot_blob(index)
+    with open(output_file, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    return output_file
 
-        for player_name, account_id in team_data["players"].items():
-            current += 1
-            print(f"\n[{current}/{total_players}] 正在获取 {player_name} (ID: {account_id}) 的数据...")
+class SnapshotReader:
+    """
+    按需读取二进制快照：打开时只解析索引，
+    team()/player() 只解压所需的数据段，load() 读取全部（与JSON快照结构相同）
+    """
 
-            player_info = get_player_info(account_id)
-            time.sleep(REQUEST_DELAY)
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'rb')
+        if self.file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            self.file.close()
+            raise ValueError(f"不是二进制结果快照: {path}")
+        (header_size,) = struct.unpack("<I", self.file.read(4))
+        index = decode_snapshot_blob(self.file.read(header_size))
+        self.data_start = len(SNAPSHOT_MAGIC) + 4 + header_size
+        self.index = {entry["name"]: entry for entry in index}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def team_names(self):
+        return list(self.index)
+
+    def player_names(self, team_name):
+        return [name for name, _, _ in self.index[team_name]["players"]]
+
+    def read_player(self, offset, size):
+        with self.lock:
+            self.file.seek(self.data_start + offset)
+            blob = self.file.read(size)
+        player_data = decode_snapshot_blob(blob)
+        if player_data.get("stats"):
+            restore_hero_usage(player_data["stats"])
+        return player_data
+
+    def player(self, team_name, player_name):
+        """只解压一名选手的数据"""
+        for name, offset, size in self.index[team_name]["players"]:
+            if name == player_name:
+                return self.read_player(offset, size)
+        raise KeyError(player_name)
+
+    def team(self, team_name):
+        """只解压一支队伍的数据"""
+        entry = self.index[team_name]
+        team_data = dict(entry["team"])
+        team_data["players"] = {name: self.read_player(offset, size)
+                                for name, offset, size in entry["players"]}
+        return team_data
+
+    def load(self):
+        """读取完整结果"""
+        return {team_name: self.team(team_name) for team_name in self.index}
+
+# ============== 报告片段缓存 ==============
+
+def player_data_hash(player_data):
+    """选手数据（stats、段位、共用账号等）的内容哈希，报告片段按它缓存"""
+    data = {key: value for key, value in player_data.items() if key != "data_hash"}
+    text = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class FragmentCache:
+    """
+    基于 SQLite 的报告片段缓存：选手卡片、Ban表和整支队伍的HTML以输入数据的哈希为键，
+    页面由片段拼接，刷新后只有数据变化的选手卡片及其队伍的Ban表需要重新生成。
+    键中还包含本文件内容的哈希（BP片段另含BP阈值），代码或参数变化后旧片段自然失效；
+    同一层的片段（全部队伍、一支队伍的全部卡片）用一次查询批量读取，新片段先留在内存，flush() 时一次写入
+    """
 
-            matches = get_player_matches(account_id, MATCHES_LIMIT)
-            time.sleep(REQUEST_DELAY)
+    def __init__(self, path, max_age=FRAGMENT_CACHE_MAX_AGE):
+        self.hits = 0
+        self.misses = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.conn = open_sqlite(
+            path,
+            "CREATE TABLE IF NOT EXISTS fragments ("
+            "key TEXT PRIMARY KEY, html TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.conn.execute("DELETE FROM fragments WHERE created_at < ?", (time.time() - max_age,))
+        self.conn.commit()
+        with open(os.path.abspath(__file__), 'rb') as f:
+            self.code_version = hashlib.sha256(f.read()).hexdigest()
+
+    def make_key(self, kind, *parts):
+        """片段键；输入数据缺少哈希（parts 或其中的列表含 None，如旧快照）时返回 None，表示不缓存"""
+        for part in parts:
+            if part is None or (isinstance(part, list) and None in part):
+                return None
+        settings = (BP_MIN_GAMES, BP_HIGH_WINRATE, BP_THREAT_WINRATE) if kind.startswith("bp_") else None
+        text = json.dumps([self.code_version, settings, kind, parts], ensure_ascii=False)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """批量读取片段，返回 {键: html}，只含命中的键"""
+        with self.lock:
+            found = {key: self.pending[key] for key in keys if key in self.pending}
+            rest = [key for key in keys if key not in found]
+            for start in range(0, len(rest), FRAGMENT_QUERY_BATCH):
+                batch = rest[start:start + FRAGMENT_QUERY_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                found.update(self.conn.execute(
+                    f"SELECT key, html FROM fragments WHERE key IN ({placeholders})", batch))
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key, html):
+        with self.lock:
+            self.pending[key] = html
+
+    def flush(self):
+        """把新生成的片段写入数据库"""
+        with self.lock:
+            if not self.pending:
+                return
+            now = time.time()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO fragments (key, html, created_at) VALUES (?, ?, ?)",
+                [(key, html, now) for key, html in self.pending.items()]
+            )
+            self.conn.commit()
+            self.pending = {}
+
+    def summary(self):
+        """片段复用统计"""
+        return f"报告片段: 复用 {self.hits} 个 / 重新生成 {self.misses} 个"
+
+# 由入口按命令行参数创建；为 None 时每次都生成全部片段
+fragment_cache = None
+
+def cached_fragments(kind, items, render):
+    """
+    批量取缓存的报告片段：items 为 [(键的组成部分, render 的参数)]，按顺序返回各片段的HTML；
+    一次查询读取全部片段，没有命中的调用 render(*参数) 生成并缓存
+    """
+    if fragment_cache is None:
+        return [render(*args) for _, args in items]
+    keys = [fragment_cache.make_key(kind, *parts) for parts, _ in items]
+    found = fragment_cache.get_many([key for key in keys if key is not None])
+    fragments = []
+    for key, (_, args) in zip(keys, items):
+        html = found.get(key)
+        if html is None:
+            html = render(*args)
+            if key is not None:
+                fragment_cache.put(key, html)
+        fragments.append(html)
+    return fragments
+
+def cached_fragment(kind, parts, render, *args):
+    """取缓存的单个报告片段，没有时调用 render(*args) 生成并缓存"""
+    return cached_fragments(kind, [(parts, args)], render)[0]
 
-            if not matches:
-                print(f"  ⚠️ 未能获取到比赛数据")
-                team_results["players"][player_name] = {
-                    "account_id": account_id,
-                    "error": "无法获取数据"
-                }
-                continue
+# ============== 报告生成 ==============
 
-            stats = analyze_matches(matches, hero_map)
-
-            if stats:
-                # 解析段位信息
-                rank_info = None
-                if player_info:
-                    rank_tier = player_info.get('rank_tier')
-                    leaderboard_rank = player_info.get('leaderboard_rank')
-                    computed_mmr = player_info.get('computed_mmr')
-                    rank_info = parse_rank_tier(rank_tier, leaderboard_rank, computed_mmr)
-
-                team_results["players"][player_name] = {
-                    "account_id": account_id,
-                    "profile": player_info.get('profile', {}) if player_info else {},
-                    "rank": rank_info,
-                    "stats": stats
-                }
-
-                pos = stats["position_analysis"]
-                trend = stats.get("trend_analysis", {})
-                trend_emoji = trend.get("trend_emoji", "➡️") if trend else "➡️"
-
-                rank_display = rank_info.get("display", "未知") if rank_info else "未知"
-                print(f"  ✅ 成功获取 {len(matches)} 场比赛数据")
-                print(f"     段位: {rank_display}")
-                print(f"     位置: {pos['position_name']} (置信度: {pos['confidence']}%)")
-                print(f"     胜率: {stats['win_rate']}% | KDA: {stats['kda_ratio']} {trend_emoji}")
-                print(f"     招牌: {', '.join([h['hero'] for h in stats['top_heroes'][:3]])}")
-            else:
-                team_results["players"][player_name] = {
-                    "account_id": account_id,
-                    "error": "数据分析失败"
-                }
+# 各报告用到的 stats 字段：抓取时只计算所选报告需要的分析（见 STATS_FIELDS）
+REPORT_STATS_FIELDS = {
+    "json": tuple(STATS_FIELDS),
+    "snapshot": tuple(STATS_FIELDS),
+    "html": ("win_rate", "kda_ratio", "top_heroes", "position_analysis", "trend_analysis", "duration_analysis"),
+    "summary": ("win_rate", "kda_ratio", "top_heroes", "position_analysis", "trend_analysis", "duration_analysis"),
+    "bp_txt": ("win_rate", "kda_ratio", "top_heroes", "position_analysis", "trend_analysis"),
+    "bp_html": ("win_rate", "kda_ratio", "top_heroes", "position_analysis", "trend_analysis"),
+    "bp_md": ("win_rate", "kda_ratio", "top_heroes", "position_analysis", "trend_analysis"),
+}
+# 抓取过程中控制台输出（print_player_result）用到的字段
+CONSOLE_STATS_FIELDS = ("win_rate", "kda_ratio", "top_heroes", "position_analysis", "trend_analysis")
 
-        all_results[team_name] = team_results
+def stats_fields_for_reports(reports):
+    """所选报告（REPORT_STATS_FIELDS 的键）共同需要的 stats 字段"""
+    fields = set(CONSOLE_STATS_FIELDS)
+    for report in reports:
+        fields.update(REPORT_STATS_FIELDS[report])
+    return fields
 
-    return all_results, hero_map
+def shared_account_text(player_data):
+    """共用账号的其他名单位置（如 "队伍8/老刘"），没有则返回空字符串"""
+    return "、".join(player_data.get("shared_with", []))
 
-# ============== 报告生成 ==============
+class LineWriter:
+    """
+    逐行写出文本报告：输出与 "\n".join(lines) 相同，但每行直接写入 out（文件、sys.stdout 等），
+    不在内存中累积整份报告
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.started = False
+
+    def append(self, line):
+        if self.started:
+            self.out.write("\n")
+        self.started = True
+        self.out.write(line)
 
 def generate_wechat_summary(results):
-    """生成微信/飞书友好的文字摘要"""
-    lines = []
+    """生成微信/飞书友好的文字摘要，返回字符串"""
+    buffer = io.StringIO()
+    write_wechat_summary(buffer, results)
+    return buffer.getvalue()
+
+def write_wechat_summary(out, results):
+    """把微信/飞书文字摘要逐行写入 out"""
+    lines = LineWriter(out)
     lines.append("=" * 40)
     lines.append("📊 Dota2 对手分析简报")
     lines.append(f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M')}")
@@ -646,6 +1933,9 @@ def generate_wechat_summary(results):
             # 主要信息行
             lines.append(f"\n🎯 {player_name} ({pos['position_name']}) {trend_emoji}{trend_text}")
             lines.append(f"   段位: {rank_display}")
+            shared = shared_account_text(player_data)
+            if shared:
+                lines.append(f"   🔗 共用账号: {shared}")
 
             # 招牌英雄
             top3 = stats["top_heroes"][:3]
@@ -669,11 +1959,152 @@ def generate_wechat_summary(results):
 
     lines.append("\n" + "=" * 40)
 
-    return "\n".join(lines)
+def html_team_section(team_name, team_data):
+    """HTML报告中一支队伍：标题与各选手卡片（卡片按选手数据哈希缓存）"""
+    color = team_data.get("color", "#666")
+    cards = "".join(cached_fragments("html_card", [
+        ((player_name, player_data.get("data_hash")), (player_name, player_data))
+        for player_name, player_data in team_data.get("players", {}).items()
+    ], html_player_card))
+    return f"""
+        <div class="team-section" style="border-left-color: {color};">
+            <h2 class="team-title">
+                <span style="color: {color};">●</span> {team_name}
+            </h2>
+            <div class="player-cards">
+{cards}
+            </div>
+        </div>
+"""
+
+def html_player_card(player_name, player_data):
+    """HTML报告中一名选手的卡片"""
+    if "error" in player_data:
+        return f"""
+                <div class="player-card error-card">
+                    <div class="player-header">
+                        <span class="player-name">{player_name}</span>
+                        <span class="player-position">❌ 数据缺失</span>
+                    </div>
+                    <p style="color: #f87171;">{player_data.get('error', '未知错误')}</p>
+                </div>
+"""
+
+    stats = player_data["stats"]
+    pos = stats["position_analysis"]
+    trend = stats.get("trend_analysis", {})
+    duration = stats.get("duration_analysis", {})
+
+    trend_class = "trend-stable"
+    trend_emoji = "➡️"
+    trend_text = "稳定"
+    if trend:
+        if trend.get("trend_direction") == "up":
+            trend_class = "trend-up"
+            trend_emoji = "🔥"
+            trend_text = "上升"
+        elif trend.get("trend_direction") == "down":
+            trend_class = "trend-down"
+            trend_emoji = "📉"
+            trend_text = "下滑"
+
+    win_rate = stats['win_rate']
+    win_rate_color = "#4ade80" if win_rate >= 55 else "#fbbf24" if win_rate >= 45 else "#f87171"
+
+    parts = [f"""
+                <div class="player-card">
+                    <div class="player-header">
+                        <span class="player-name">{player_name}</span>
+                        <span class="player-position">{pos['position_name']}</span>
+                    </div>
+
+                    <div class="stat-row">
+                        <span class="stat-label">整体胜率</span>
+                        <span class="stat-value" style="color: {win_rate_color};">{win_rate}%</span>
+                    </div>
+                    <div class="win-rate-bar">
+                        <div class="win-rate-fill" style="width: {win_rate}%; background: {win_rate_color};"></div>
+                    </div>
+
+                    <div class="stat-row">
+                        <span class="stat-label">KDA比率</span>
+                        <span class="stat-value">{stats['kda_ratio']}</span>
+                    </div>
+
+                    <div class="stat-row">
+                        <span class="stat-label">近期状态</span>
+                        <span class="stat-value {trend_class}">{trend_emoji} {trend_text}</span>
+                    </div>
+"""]
+
+    shared = shared_account_text(player_data)
+    if shared:
+        parts.append(f"""
+                    <div class="stat-row">
+                        <span class="stat-label">🔗 共用账号</span>
+                        <span class="stat-value">{shared}</span>
+                    </div>
+""")
+
+    # 近期趋势详情
+    if trend and trend.get("recent"):
+        recent = trend["recent"]
+        parts.append(f"""
+                    <div class="stat-row">
+                        <span class="stat-label">近20场</span>
+                        <span class="stat-value">{recent['win_rate']}% / KDA {recent['kda']}</span>
+                    </div>
+""")
+
+    # 时长分析
+    if duration:
+        parts.append("""
+                    <div class="duration-analysis">
+""")
+        for period in ["early", "mid", "late"]:
+            d = duration.get(period, {})
+            if d.get("games", 0) > 0:
+                parts.append(f"""
+                        <div class="duration-item">
+                            <div class="duration-label">{d.get('label', period)}</div>
+                            <div class="duration-value">{d.get('win_rate', 0)}%</div>
+                            <div class="duration-label">{d.get('games', 0)}场</div>
+                        </div>
+""")
+        parts.append("""
+                    </div>
+""")
+
+    # 招牌英雄
+    parts.append("""
+                    <div class="hero-list">
+                        <div class="stat-label" style="margin-bottom: 10px;">招牌英雄</div>
+""")
+    for hero in stats["top_heroes"][:5]:
+        hero_wr = hero['win_rate']
+        hero_color = "#4ade80" if hero_wr >= 55 else "#fbbf24" if hero_wr >= 45 else "#f87171"
+        parts.append(f"""
+                        <div class="hero-item">
+                            <span class="hero-name">{hero['hero']}</span>
+                            <span class="hero-stats">{hero['games']}场 <span style="color: {hero_color};">{hero_wr}%</span></span>
+                        </div>
+""")
+
+    parts.append("""
+                    </div>
+                </div>
+""")
+    return "".join(parts)
 
 def generate_html_report(results, output_file):
     """生成HTML可视化报告"""
-    html_content = """<!DOCTYPE html>
+    with open(output_file, 'w', encoding='utf-8') as f:
+        write_html_report(f, results)
+    return output_file
+
+def write_html_report(out, results):
+    """把HTML可视化报告逐段写入 out（每名选手一张卡片，写完即丢弃）"""
+    out.write("""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
@@ -795,142 +2226,22 @@ def generate_html_report(results, output_file):
     <div class="container">
         <h1>🎮 Dota2 对手分析报告</h1>
         <p class="timestamp">生成时间: """ + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + """</p>
-"""
+""")
 
+    teams = []
     for team_name, team_data in results.items():
-        color = team_data.get("color", "#666")
-        html_content += f"""
-        <div class="team-section" style="border-left-color: {color};">
-            <h2 class="team-title">
-                <span style="color: {color};">●</span> {team_name}
-            </h2>
-            <div class="player-cards">
-"""
-
-        for player_name, player_data in team_data.get("players", {}).items():
-            if "error" in player_data:
-                html_content += f"""
-                <div class="player-card error-card">
-                    <div class="player-header">
-                        <span class="player-name">{player_name}</span>
-                        <span class="player-position">❌ 数据缺失</span>
-                    </div>
-                    <p style="color: #f87171;">{player_data.get('error', '未知错误')}</p>
-                </div>
-"""
-                continue
-
-            stats = player_data["stats"]
-            pos = stats["position_analysis"]
-            trend = stats.get("trend_analysis", {})
-            duration = stats.get("duration_analysis", {})
-
-            trend_class = "trend-stable"
-            trend_emoji = "➡️"
-            trend_text = "稳定"
-            if trend:
-                if trend.get("trend_direction") == "up":
-                    trend_class = "trend-up"
-                    trend_emoji = "🔥"
-                    trend_text = "上升"
-                elif trend.get("trend_direction") == "down":
-                    trend_class = "trend-down"
-                    trend_emoji = "📉"
-                    trend_text = "下滑"
-
-            win_rate = stats['win_rate']
-            win_rate_color = "#4ade80" if win_rate >= 55 else "#fbbf24" if win_rate >= 45 else "#f87171"
-
-            html_content += f"""
-                <div class="player-card">
-                    <div class="player-header">
-                        <span class="player-name">{player_name}</span>
-                        <span class="player-position">{pos['position_name']}</span>
-                    </div>
-
-                    <div class="stat-row">
-                        <span class="stat-label">整体胜率</span>
-                        <span class="stat-value" style="color: {win_rate_color};">{win_rate}%</span>
-                    </div>
-                    <div class="win-rate-bar">
-                        <div class="win-rate-fill" style="width: {win_rate}%; background: {win_rate_color};"></div>
-                    </div>
-
-                    <div class="stat-row">
-                        <span class="stat-label">KDA比率</span>
-                        <span class="stat-value">{stats['kda_ratio']}</span>
-                    </div>
-
-                    <div class="stat-row">
-                        <span class="stat-label">近期状态</span>
-                        <span class="stat-value {trend_class}">{trend_emoji} {trend_text}</span>
-                    </div>
-"""
-
-            # 近期趋势详情
-            if trend and trend.get("recent"):
-                recent = trend["recent"]
-                html_content += f"""
-                    <div class="stat-row">
-                        <span class="stat-label">近20场</span>
-                        <span class="stat-value">{recent['win_rate']}% / KDA {recent['kda']}</span>
-                    </div>
-"""
-
-            # 时长分析
-            if duration:
-                html_content += """
-                    <div class="duration-analysis">
-"""
-                for period in ["early", "mid", "late"]:
-                    d = duration.get(period, {})
-                    if d.get("games", 0) > 0:
-                        html_content += f"""
-                        <div class="duration-item">
-                            <div class="duration-label">{d.get('label', period)}</div>
-                            <div class="duration-value">{d.get('win_rate', 0)}%</div>
-                            <div class="duration-label">{d.get('games', 0)}场</div>
-                        </div>
-"""
-                html_content += """
-                    </div>
-"""
-
-            # 招牌英雄
-            html_content += """
-                    <div class="hero-list">
-                        <div class="stat-label" style="margin-bottom: 10px;">招牌英雄</div>
-"""
-            for hero in stats["top_heroes"][:5]:
-                hero_wr = hero['win_rate']
-                hero_color = "#4ade80" if hero_wr >= 55 else "#fbbf24" if hero_wr >= 45 else "#f87171"
-                html_content += f"""
-                        <div class="hero-item">
-                            <span class="hero-name">{hero['hero']}</span>
-                            <span class="hero-stats">{hero['games']}场 <span style="color: {hero_color};">{hero_wr}%</span></span>
-                        </div>
-"""
-
-            html_content += """
-                    </div>
-                </div>
-"""
-
-        html_content += """
-            </div>
-        </div>
-"""
-
-    html_content += """
-    </div>
-</body>
-</html>
-"""
-
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-
-    return output_file
+        players = team_data.get("players", {})
+        parts = (team_name, team_data.get("color", "#666"), list(players),
+                 [player_data.get("data_hash") for player_data in players.values()])
+        teams.append((parts, (team_name, team_data)))
+    for section in cached_fragments("html_team", teams, html_team_section):
+        out.write(section)
+
+    out.write("""
+    </div>
+</body>
+</html>
+""")
 
 # ============== BP专用报告 ==============
 
@@ -996,9 +2307,83 @@ def calculate_ban_priority(hero, player_name, position):
         "priority_score": round(score, 1)
     }
 
-def generate_bp_report(results, output_file):
-    """生成BP专用报告"""
-    lines = []
+def build_bp_model(results):
+    """
+    BP分析模型：每名选手的招牌/熟练英雄、各队Ban优先级与核心英雄池、全局高威胁榜
+    每次运行只计算一次，由 TXT/HTML/Markdown 三种BP报告共用
+    """
+    teams = []
+    global_bans = []
+
+    for team_name, team_data in results.items():
+        players = []
+        team_bans = []
+        hero_pool = {}  # 队伍英雄池汇总
+
+        for player_name, player_data in team_data.get("players", {}).items():
+            if "error" in player_data:
+                players.append({"name": player_name, "error": player_data["error"],
+                                "data_hash": player_data.get("data_hash")})
+                continue
+
+            stats = player_data["stats"]
+            position_name = stats["position_analysis"]["position_name"]
+            hero_analysis = analyze_signature_heroes(stats)
+            rank_info = player_data.get("rank", {})
+
+            for hero in hero_analysis["signature"]:
+                ban_item = calculate_ban_priority(hero, player_name, position_name)
+                team_bans.append(ban_item)
+                global_bans.append({**ban_item, "team": team_name})
+                hero_pool.setdefault(hero["hero"], []).append({
+                    "player": player_name,
+                    "position": position_name,
+                    "games": hero["games"],
+                    "win_rate": hero["win_rate"]
+                })
+
+            players.append({
+                "name": player_name,
+                "stats": stats,
+                "position_name": position_name,
+                "trend": stats.get("trend_analysis") or {},
+                "rank_display": rank_info.get("display", "未知") if rank_info else "未知",
+                "shared": shared_account_text(player_data),
+                "data_hash": player_data.get("data_hash"),
+                **hero_analysis
+            })
+
+        team_bans.sort(key=lambda x: x["priority_score"], reverse=True)
+        teams.append({
+            "name": team_name,
+            "color": team_data.get("color", "#666"),
+            "players": players,
+            "bans": team_bans,
+            # 按使用人数排序
+            "hero_pool": sorted(hero_pool.items(), key=lambda x: len(x[1]), reverse=True)
+        })
+
+    global_bans.sort(key=lambda x: x["priority_score"], reverse=True)
+    return {"teams": teams, "global_bans": global_bans}
+
+def trend_label(trend, hot, cold):
+    """状态火热/低迷标记，状态稳定时为空"""
+    if trend.get("trend_direction") == "up":
+        return hot
+    if trend.get("trend_direction") == "down":
+        return cold
+    return ""
+
+def generate_bp_report(results, output_file, bp_model=None):
+    """生成BP专用报告（bp_model 为 build_bp_model 的结果，未提供时现场计算）"""
+    model = bp_model if bp_model is not None else build_bp_model(results)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        write_bp_report(f, model)
+    return output_file
+
+def write_bp_report(out, model):
+    """把BP专用文字报告逐行写入 out"""
+    lines = LineWriter(out)
 
     lines.append("=" * 70)
     lines.append("🎯 DOTA2 BP专用分析报告")
@@ -1011,112 +2396,74 @@ def generate_bp_report(results, output_file):
     lines.append("  • 英雄池浅: 招牌英雄≤2个，容易被针对")
     lines.append("")
 
-    # 收集所有Ban建议
-    all_ban_suggestions = []
-
-    for team_name, team_data in results.items():
+    for team in model["teams"]:
+        team_name = team["name"]
         lines.append("")
         lines.append("=" * 70)
         lines.append(f"【{team_name}】")
         lines.append("=" * 70)
 
-        team_ban_suggestions = []
-        team_hero_pool = {}  # 队伍英雄池汇总
-
-        for player_name, player_data in team_data.get("players", {}).items():
-            if "error" in player_data:
+        for player in team["players"]:
+            player_name = player["name"]
+            if "error" in player:
                 lines.append(f"\n❌ {player_name}: 数据缺失，无法分析")
                 continue
 
-            stats = player_data["stats"]
-            pos = stats["position_analysis"]
-            position_name = pos["position_name"]
-            trend = stats.get("trend_analysis", {})
-
-            # 分析招牌英雄
-            hero_analysis = analyze_signature_heroes(stats)
-            signature = hero_analysis["signature"]
-            comfort = hero_analysis["comfort"]
-
-            # 状态标记
-            trend_emoji = ""
-            if trend:
-                if trend.get("trend_direction") == "up":
-                    trend_emoji = " 🔥状态火热"
-                elif trend.get("trend_direction") == "down":
-                    trend_emoji = " 📉状态低迷"
-
-            # 段位信息
-            rank_info = player_data.get("rank", {})
-            rank_display = rank_info.get("display", "未知") if rank_info else "未知"
+            stats = player["stats"]
+            trend = player["trend"]
+            trend_emoji = trend_label(trend, " 🔥状态火热", " 📉状态低迷")
 
             lines.append("")
             lines.append(f"┌─────────────────────────────────────────")
-            lines.append(f"│ 🎮 {player_name} [{position_name}]{trend_emoji}")
-            lines.append(f"│    段位: {rank_display}")
+            lines.append(f"│ 🎮 {player_name} [{player['position_name']}]{trend_emoji}")
+            lines.append(f"│    段位: {player['rank_display']}")
+            if player["shared"]:
+                lines.append(f"│    🔗 共用账号: {player['shared']}")
             lines.append(f"│    整体: {stats['win_rate']}%胜率 | KDA: {stats['kda_ratio']}")
 
-            if trend and trend.get("recent"):
+            if trend.get("recent"):
                 recent = trend["recent"]
                 lines.append(f"│    近20场: {recent['win_rate']}%胜率 | KDA: {recent['kda']}")
 
             lines.append(f"├─────────────────────────────────────────")
 
             # 招牌英雄（必Ban候选）
+            signature = player["signature"]
             if signature:
                 lines.append(f"│ 🚨 必Ban候选 ({len(signature)}个):")
                 for hero in signature:
                     threat = "🔴" if hero["threat_level"] == "high" else "🟡"
                     lines.append(f"│    {threat} {hero['hero']}: {hero['games']}场 {hero['win_rate']}%胜率")
-
-                    # 加入Ban建议
-                    ban_item = calculate_ban_priority(hero, player_name, position_name)
-                    team_ban_suggestions.append(ban_item)
-                    all_ban_suggestions.append({**ban_item, "team": team_name})
-
-                    # 加入队伍英雄池
-                    hero_name = hero["hero"]
-                    if hero_name not in team_hero_pool:
-                        team_hero_pool[hero_name] = []
-                    team_hero_pool[hero_name].append({
-                        "player": player_name,
-                        "position": position_name,
-                        "games": hero["games"],
-                        "win_rate": hero["win_rate"]
-                    })
             else:
                 lines.append(f"│ ⚪ 无明显招牌英雄")
 
             # 熟练英雄
-            if comfort:
+            if player["comfort"]:
                 lines.append(f"│ 📋 熟练英雄:")
-                comfort_str = ", ".join([f"{h['hero']}({h['games']}场{h['win_rate']}%)" for h in comfort[:4]])
+                comfort_str = ", ".join([f"{h['hero']}({h['games']}场{h['win_rate']}%)" for h in player["comfort"][:4]])
                 lines.append(f"│    {comfort_str}")
 
             # 英雄池评估
-            if hero_analysis["is_shallow_pool"]:
-                lines.append(f"│ ⚠️ 英雄池较浅! 只有{hero_analysis['pool_depth']}个招牌英雄")
+            if player["is_shallow_pool"]:
+                lines.append(f"│ ⚠️ 英雄池较浅! 只有{player['pool_depth']}个招牌英雄")
                 lines.append(f"│    → Ban掉招牌后可能影响发挥")
 
             lines.append(f"└─────────────────────────────────────────")
 
         # 队伍Ban建议汇总
-        if team_ban_suggestions:
+        if team["bans"]:
             lines.append("")
             lines.append(f"📊 {team_name} Ban优先级排序:")
             lines.append("-" * 50)
-            team_ban_suggestions.sort(key=lambda x: x["priority_score"], reverse=True)
-            for i, ban in enumerate(team_ban_suggestions[:8], 1):
+            for i, ban in enumerate(team["bans"][:8], 1):
                 lines.append(f"  {i}. {ban['hero']} ({ban['player']}) - {ban['games']}场{ban['win_rate']}% [分数:{ban['priority_score']}]")
 
         # 队伍英雄池汇总
-        if team_hero_pool:
+        if team["hero_pool"]:
             lines.append("")
             lines.append(f"📋 {team_name} 核心英雄池:")
             lines.append("-" * 50)
-            # 按使用人数排序
-            sorted_pool = sorted(team_hero_pool.items(), key=lambda x: len(x[1]), reverse=True)
-            for hero_name, players in sorted_pool[:10]:
+            for hero_name, players in team["hero_pool"][:10]:
                 if len(players) > 1:
                     player_str = ", ".join([f"{p['player']}({p['win_rate']}%)" for p in players])
                     lines.append(f"  🔸 {hero_name}: {player_str}")
@@ -1130,8 +2477,7 @@ def generate_bp_report(results, output_file):
     lines.append("🏆 全局高威胁英雄榜 (所有队伍)")
     lines.append("=" * 70)
 
-    all_ban_suggestions.sort(key=lambda x: x["priority_score"], reverse=True)
-    for i, ban in enumerate(all_ban_suggestions[:15], 1):
+    for i, ban in enumerate(model["global_bans"][:15], 1):
         lines.append(f"  {i:2d}. {ban['hero']:<20} | {ban['player']:<12} | {ban['team']:<6} | {ban['games']}场 {ban['win_rate']}%")
 
     lines.append("")
@@ -1143,16 +2489,124 @@ def generate_bp_report(results, output_file):
     lines.append("  4. 如果多人共用英雄，一个Ban可以影响多人")
     lines.append("=" * 70)
 
-    report_content = "\n".join(lines)
+def bp_html_team_section(team):
+    """BP HTML报告中一支队伍：选手卡片与队伍Ban表（分别按选手数据哈希缓存）"""
+    cards = "".join(cached_fragments("bp_card", [
+        ((player["name"], player["data_hash"]), (player,)) for player in team["players"]
+    ], bp_html_player_card))
+    # Ban表只取决于本队选手的数据与BP阈值
+    bans = cached_fragment("bp_bans", (team["name"], [player["name"] for player in team["players"]],
+                                       [player["data_hash"] for player in team["players"]]),
+                           bp_html_ban_table, team["bans"])
+    return f"""
+    <div class="team-section">
+        <div class="team-header">
+            <span class="team-name" style="color: {team['color']};">● {team['name']}</span>
+        </div>
+        <div class="player-grid">
+{cards}</div>{bans}</div>"""
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(report_content)
+def bp_html_player_card(player):
+    """BP HTML报告中一名选手的卡片（player 为 BP 模型中的选手项）"""
+    player_name = player["name"]
+    if "error" in player:
+        return f"""
+            <div class="player-card" style="opacity: 0.5;">
+                <div class="player-header">
+                    <span class="player-name">{player_name}</span>
+                    <span class="player-position">数据缺失</span>
+                </div>
+            </div>
+"""
+
+    stats = player["stats"]
+    trend_html = trend_label(player["trend"], '<span class="trend-hot">🔥 状态火热</span>',
+                             '<span class="trend-cold">📉 状态低迷</span>')
+    # 只有共用账号时才多出一行，其余选手卡片与原版逐字节相同
+    shared_html = (f'\n                        <div class="player-stats">🔗 共用账号: {player["shared"]}</div>'
+                   if player["shared"] else "")
+
+    parts = [f"""
+            <div class="player-card">
+                <div class="player-header">
+                    <div>
+                        <div class="player-name">{player_name}</div>
+                        <div class="player-stats">🏅 {player['rank_display']}</div>
+                        <div class="player-stats">{stats['win_rate']}%胜率 | KDA {stats['kda_ratio']} {trend_html}</div>{shared_html}
+                    </div>
+                    <span class="player-position">{player['position_name']}</span>
+                </div>
+"""]
+
+    if player["signature"]:
+        parts.append('<div class="section-title">🚨 必Ban候选</div>')
+        for hero in player["signature"]:
+            threat_class = "threat-high" if hero["threat_level"] == "high" else "threat-medium"
+            wr_class = "winrate-high" if hero["win_rate"] >= 60 else "winrate-mid"
+            parts.append(f"""
+                <div class="hero-item {threat_class}">
+                    <span class="hero-name">{hero['hero']}</span>
+                    <span class="hero-stats-inline">{hero['games']}场 <span class="hero-winrate {wr_class}">{hero['win_rate']}%</span></span>
+                </div>
+""")
+    else:
+        parts.append('<div class="no-signature">无明显招牌英雄</div>')
 
-    return report_content
+    if player["comfort"]:
+        parts.append('<div class="section-title">熟练英雄</div>')
+        for hero in player["comfort"][:3]:
+            wr_class = "winrate-mid" if hero["win_rate"] >= 50 else "winrate-low"
+            parts.append(f"""
+                <div class="hero-item">
+                    <span class="hero-name">{hero['hero']}</span>
+                    <span class="hero-stats-inline">{hero['games']}场 <span class="hero-winrate {wr_class}">{hero['win_rate']}%</span></span>
+                </div>
+""")
+
+    if player["is_shallow_pool"]:
+        parts.append(f"""
+                <div class="shallow-pool-warning">
+                    ⚠️ 英雄池较浅 (仅{player['pool_depth']}个招牌) - 容易被针对
+                </div>
+""")
 
-def generate_bp_html_report(results, output_file):
-    """生成BP专用HTML报告"""
-    html = """<!DOCTYPE html>
+    parts.append("</div>")
+    return "".join(parts)
+
+def bp_html_ban_table(bans):
+    """BP HTML报告中一支队伍的Ban优先级列表，没有Ban建议时为空"""
+    if not bans:
+        return ""
+    parts = ["""
+        <div class="ban-priority">
+            <h3>📊 Ban优先级排序</h3>
+            <ul class="ban-list">
+"""]
+    for i, ban in enumerate(bans[:8], 1):
+        parts.append(f"""
+                <li>
+                    <span class="ban-rank">{i}.</span>
+                    <span class="ban-hero">{ban['hero']}</span>
+                    <span class="ban-player">{ban['player']}</span>
+                    <span class="ban-score">{ban['games']}场 {ban['win_rate']}%</span>
+                </li>
+""")
+    parts.append("""
+            </ul>
+        </div>
+""")
+    return "".join(parts)
+
+def generate_bp_html_report(results, output_file, bp_model=None):
+    """生成BP专用HTML报告（bp_model 见 generate_bp_report）"""
+    model = bp_model if bp_model is not None else build_bp_model(results)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        write_bp_html_report(f, model)
+    return output_file
+
+def write_bp_html_report(out, model):
+    """把BP专用HTML报告逐段写入 out"""
+    out.write("""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
@@ -1288,142 +2742,30 @@ def generate_bp_html_report(results, output_file):
         <div class="legend-item"><span class="dot dot-yellow"></span> 中威胁 (胜率≥55%)</div>
         <div class="legend-item"><span class="dot dot-gray"></span> 熟练英雄</div>
     </div>
-"""
-
-    for team_name, team_data in results.items():
-        color = team_data.get("color", "#666")
-
-        # 收集队伍Ban建议
-        team_bans = []
-
-        html += f"""
-    <div class="team-section">
-        <div class="team-header">
-            <span class="team-name" style="color: {color};">● {team_name}</span>
-        </div>
-        <div class="player-grid">
-"""
+""")
 
-        for player_name, player_data in team_data.get("players", {}).items():
-            if "error" in player_data:
-                html += f"""
-            <div class="player-card" style="opacity: 0.5;">
-                <div class="player-header">
-                    <span class="player-name">{player_name}</span>
-                    <span class="player-position">数据缺失</span>
-                </div>
-            </div>
-"""
-                continue
-
-            stats = player_data["stats"]
-            pos = stats["position_analysis"]
-            trend = stats.get("trend_analysis", {})
-
-            hero_analysis = analyze_signature_heroes(stats)
-            signature = hero_analysis["signature"]
-            comfort = hero_analysis["comfort"]
-
-            trend_html = ""
-            if trend:
-                if trend.get("trend_direction") == "up":
-                    trend_html = '<span class="trend-hot">🔥 状态火热</span>'
-                elif trend.get("trend_direction") == "down":
-                    trend_html = '<span class="trend-cold">📉 状态低迷</span>'
-
-            # 段位信息
-            rank_info = player_data.get("rank", {})
-            rank_display = rank_info.get("display", "未知") if rank_info else "未知"
+    teams = [((team["name"], team["color"], [player["name"] for player in team["players"]],
+               [player["data_hash"] for player in team["players"]]), (team,))
+             for team in model["teams"]]
+    for section in cached_fragments("bp_team", teams, bp_html_team_section):
+        out.write(section)
 
-            html += f"""
-            <div class="player-card">
-                <div class="player-header">
-                    <div>
-                        <div class="player-name">{player_name}</div>
-                        <div class="player-stats">🏅 {rank_display}</div>
-                        <div class="player-stats">{stats['win_rate']}%胜率 | KDA {stats['kda_ratio']} {trend_html}</div>
-                    </div>
-                    <span class="player-position">{pos['position_name']}</span>
-                </div>
-"""
-
-            if signature:
-                html += '<div class="section-title">🚨 必Ban候选</div>'
-                for hero in signature:
-                    threat_class = "threat-high" if hero["threat_level"] == "high" else "threat-medium"
-                    wr_class = "winrate-high" if hero["win_rate"] >= 60 else "winrate-mid"
-                    html += f"""
-                <div class="hero-item {threat_class}">
-                    <span class="hero-name">{hero['hero']}</span>
-                    <span class="hero-stats-inline">{hero['games']}场 <span class="hero-winrate {wr_class}">{hero['win_rate']}%</span></span>
-                </div>
-"""
-                    # 添加到队伍Ban列表
-                    ban_item = calculate_ban_priority(hero, player_name, pos['position_name'])
-                    team_bans.append(ban_item)
-            else:
-                html += '<div class="no-signature">无明显招牌英雄</div>'
-
-            if comfort:
-                html += '<div class="section-title">熟练英雄</div>'
-                for hero in comfort[:3]:
-                    wr_class = "winrate-mid" if hero["win_rate"] >= 50 else "winrate-low"
-                    html += f"""
-                <div class="hero-item">
-                    <span class="hero-name">{hero['hero']}</span>
-                    <span class="hero-stats-inline">{hero['games']}场 <span class="hero-winrate {wr_class}">{hero['win_rate']}%</span></span>
-                </div>
-"""
-
-            if hero_analysis["is_shallow_pool"]:
-                html += f"""
-                <div class="shallow-pool-warning">
-                    ⚠️ 英雄池较浅 (仅{hero_analysis['pool_depth']}个招牌) - 容易被针对
-                </div>
-"""
-
-            html += "</div>"
-
-        html += "</div>"  # player-grid
-
-        # 队伍Ban优先级
-        if team_bans:
-            team_bans.sort(key=lambda x: x["priority_score"], reverse=True)
-            html += """
-        <div class="ban-priority">
-            <h3>📊 Ban优先级排序</h3>
-            <ul class="ban-list">
-"""
-            for i, ban in enumerate(team_bans[:8], 1):
-                html += f"""
-                <li>
-                    <span class="ban-rank">{i}.</span>
-                    <span class="ban-hero">{ban['hero']}</span>
-                    <span class="ban-player">{ban['player']}</span>
-                    <span class="ban-score">{ban['games']}场 {ban['win_rate']}%</span>
-                </li>
-"""
-            html += """
-            </ul>
-        </div>
-"""
-
-        html += "</div>"  # team-section
-
-    html += """
+    out.write("""
 </div>
 </body>
 </html>
-"""
+""")
 
+def generate_bp_markdown_report(results, output_file, bp_model=None):
+    """生成BP专用Markdown报告（适合上传腾讯文档，bp_model 见 generate_bp_report）"""
+    model = bp_model if bp_model is not None else build_bp_model(results)
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
-
+        write_bp_markdown_report(f, model)
     return output_file
 
-def generate_bp_markdown_report(results, output_file):
-    """生成BP专用Markdown报告（适合上传腾讯文档）"""
-    lines = []
+def write_bp_markdown_report(out, model):
+    """把BP专用Markdown报告逐行写入 out"""
+    lines = LineWriter(out)
 
     lines.append("# Dota2 BP分析报告")
     lines.append("")
@@ -1437,94 +2779,71 @@ def generate_bp_markdown_report(results, output_file):
     lines.append("- **英雄池浅**: 招牌英雄≤2个，容易被针对")
     lines.append("")
 
-    # 收集所有Ban建议
-    all_ban_suggestions = []
-
-    for team_name, team_data in results.items():
+    for team in model["teams"]:
+        team_name = team["name"]
         lines.append("---")
         lines.append("")
         lines.append(f"## {team_name}")
         lines.append("")
 
-        team_ban_suggestions = []
-
-        for player_name, player_data in team_data.get("players", {}).items():
-            if "error" in player_data:
+        for player in team["players"]:
+            player_name = player["name"]
+            if "error" in player:
                 lines.append(f"### ❌ {player_name}")
                 lines.append("")
                 lines.append("数据缺失，无法分析")
                 lines.append("")
                 continue
 
-            stats = player_data["stats"]
-            pos = stats["position_analysis"]
-            position_name = pos["position_name"]
-            trend = stats.get("trend_analysis", {})
-
-            hero_analysis = analyze_signature_heroes(stats)
-            signature = hero_analysis["signature"]
-            comfort = hero_analysis["comfort"]
-
-            # 状态标记
-            trend_text = ""
-            if trend:
-                if trend.get("trend_direction") == "up":
-                    trend_text = " 🔥状态火热"
-                elif trend.get("trend_direction") == "down":
-                    trend_text = " 📉状态低迷"
+            stats = player["stats"]
+            trend = player["trend"]
+            trend_text = trend_label(trend, " 🔥状态火热", " 📉状态低迷")
 
-            # 段位信息
-            rank_info = player_data.get("rank", {})
-            rank_display = rank_info.get("display", "未知") if rank_info else "未知"
-
-            lines.append(f"### {player_name} 【{position_name}】{trend_text}")
+            lines.append(f"### {player_name} 【{player['position_name']}】{trend_text}")
             lines.append("")
 
             # 基础数据
-            lines.append(f"**段位**: {rank_display}")
+            lines.append(f"**段位**: {player['rank_display']}")
+            if player["shared"]:
+                lines.append(f"**共用账号**: {player['shared']}")
             lines.append(f"**整体**: {stats['win_rate']}%胜率 | KDA: {stats['kda_ratio']}")
-            if trend and trend.get("recent"):
+            if trend.get("recent"):
                 recent = trend["recent"]
                 lines.append(f"**近20场**: {recent['win_rate']}%胜率 | KDA: {recent['kda']}")
             lines.append("")
 
             # 招牌英雄表格
-            if signature:
+            if player["signature"]:
                 lines.append("#### 🚨 必Ban候选")
                 lines.append("")
                 lines.append("| 英雄 | 场次 | 胜率 | 威胁 |")
                 lines.append("|------|------|------|------|")
-                for hero in signature:
+                for hero in player["signature"]:
                     threat = "🔴高" if hero["threat_level"] == "high" else "🟡中"
                     lines.append(f"| {hero['hero']} | {hero['games']} | {hero['win_rate']}% | {threat} |")
-
-                    ban_item = calculate_ban_priority(hero, player_name, position_name)
-                    team_ban_suggestions.append(ban_item)
-                    all_ban_suggestions.append({**ban_item, "team": team_name})
                 lines.append("")
             else:
                 lines.append("*无明显招牌英雄*")
                 lines.append("")
 
             # 熟练英雄
-            if comfort:
-                comfort_str = ", ".join([f"{h['hero']}({h['games']}场{h['win_rate']}%)" for h in comfort[:4]])
+            if player["comfort"]:
+                comfort_str = ", ".join([f"{h['hero']}({h['games']}场{h['win_rate']}%)" for h in player["comfort"][:4]])
                 lines.append(f"**熟练英雄**: {comfort_str}")
                 lines.append("")
 
             # 英雄池评估
-            if hero_analysis["is_shallow_pool"]:
-                lines.append(f"> ⚠️ **英雄池较浅**（仅{hero_analysis['pool_depth']}个招牌）- Ban掉后可能影响发挥")
+            if player["is_shallow_pool"]:
+                lines.append(f"> ⚠️ **英雄池较浅**（仅{player['pool_depth']}个招牌）- Ban掉后可能影响发挥")
                 lines.append("")
 
         # 队伍Ban建议
-        if team_ban_suggestions:
+        if team["bans"]:
             lines.append(f"### 📊 {team_name} Ban优先级")
             lines.append("")
             lines.append("| 排名 | 英雄 | 选手 | 场次 | 胜率 |")
             lines.append("|------|------|------|------|------|")
-            team_ban_suggestions.sort(key=lambda x: x["priority_score"], reverse=True)
-            for i, ban in enumerate(team_ban_suggestions[:8], 1):
+            for i, ban in enumerate(team["bans"][:8], 1):
                 lines.append(f"| {i} | {ban['hero']} | {ban['player']} | {ban['games']} | {ban['win_rate']}% |")
             lines.append("")
 
@@ -1536,8 +2855,7 @@ def generate_bp_markdown_report(results, output_file):
     lines.append("| 排名 | 英雄 | 选手 | 队伍 | 场次 | 胜率 |")
     lines.append("|------|------|------|------|------|------|")
 
-    all_ban_suggestions.sort(key=lambda x: x["priority_score"], reverse=True)
-    for i, ban in enumerate(all_ban_suggestions[:15], 1):
+    for i, ban in enumerate(model["global_bans"][:15], 1):
         lines.append(f"| {i} | {ban['hero']} | {ban['player']} | {ban['team']} | {ban['games']} | {ban['win_rate']}% |")
 
     lines.append("")
@@ -1551,73 +2869,649 @@ def generate_bp_markdown_report(results, output_file):
     lines.append("4. 如果队伍多人共用某英雄，一个Ban影响多人")
     lines.append("")
 
-    report_content = "\n".join(lines)
-
+def save_json_results(results, output_file):
+    """保存JSON数据"""
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(report_content)
+        json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+    return output_file
 
+def generate_summary_file(results, output_file):
+    """生成微信摘要文件"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        write_wechat_summary(f, results)
     return output_file
 
-def save_results(results, hero_map):
-    """保存所有结果"""
+# 报告格式（--formats，与 REPORT_STATS_FIELDS 的键一致）-> (名称, 文件名, 生成函数(results, output_file, bp_model))
+REPORT_ARTIFACTS = {
+    "json": ("JSON数据", "dota2_analysis_{}.json",
+             lambda results, output_file, bp_model: save_json_results(results, output_file)),
+    "snapshot": ("二进制快照", "dota2_analysis_{}" + SNAPSHOT_SUFFIX,
+                 lambda results, output_file, bp_model: save_binary_snapshot(results, output_file)),
+    "html": ("HTML报告", "dota2_report_{}.html",
+             lambda results, output_file, bp_model: generate_html_report(results, output_file)),
+    "summary": ("微信摘要", "dota2_summary_{}.txt",
+                lambda results, output_file, bp_model: generate_summary_file(results, output_file)),
+    "bp_txt": ("BP报告(TXT)", "bp_report_{}.txt", generate_bp_report),
+    "bp_html": ("BP报告(HTML)", "bp_report_{}.html", generate_bp_html_report),
+    "bp_md": ("BP报告(MD)", "bp_report_{}.md", generate_bp_markdown_report),  # 腾讯文档友好
+}
+BP_REPORT_FORMATS = ("bp_txt", "bp_html", "bp_md")
+# 默认生成的报告；二进制快照与JSON内容相同，按需用 --formats snapshot 生成
+DEFAULT_FORMATS = tuple(report_format for report_format in REPORT_ARTIFACTS if report_format != "snapshot")
+OUTPUT_DIR = "output"
+
+def render_artifact(report_format, results, output_file, bp_model):
+    """
+    生成单个报告文件，返回耗时（秒）
+    先写入临时文件再替换到位：同名文件可能是 output_store 共享的硬链接，直接覆盖会改写其他运行的文件
+    """
+    start = time.perf_counter()
+    tmp_file = f"{output_file}.tmp"
+    REPORT_ARTIFACTS[report_format][2](results, tmp_file, bp_model)
+    os.replace(tmp_file, output_file)
+    return time.perf_counter() - start
+
+def save_results(results, hero_map, formats=None, workers=REPORT_WORKERS, prune=True):
+    """
+    并行生成所选格式的报告（默认 DEFAULT_FORMATS），返回生成的文件列表
+    prune 为 False 时只去重、不按保留策略清理 output/（--render 离线重新生成时）
+    """
+    if formats is None:
+        formats = list(DEFAULT_FORMATS)
+    else:
+        formats = [report_format for report_format in REPORT_ARTIFACTS if report_format in formats]
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
     # 创建输出目录
-    output_dir = "output"
+    output_dir = OUTPUT_DIR
     os.makedirs(output_dir, exist_ok=True)
 
-    # 1. 保存JSON
-    json_file = f"{output_dir}/dota2_analysis_{timestamp}.json"
-    with open(json_file, 'w', encoding='utf-8') as f:
-        # 转换 defaultdict 为普通 dict
-        def convert_dict(obj):
-            if isinstance(obj, defaultdict):
-                return dict(obj)
-            return obj
-        json.dump(results, f, ensure_ascii=False, indent=2, default=str)
-    print(f"\n✅ JSON数据: {json_file}")
-
-    # 2. 生成HTML报告
-    html_file = f"{output_dir}/dota2_report_{timestamp}.html"
-    generate_html_report(results, html_file)
-    print(f"✅ HTML报告: {html_file}")
-
-    # 3. 生成微信摘要
-    summary = generate_wechat_summary(results)
-    summary_file = f"{output_dir}/dota2_summary_{timestamp}.txt"
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        f.write(summary)
-    print(f"✅ 微信摘要: {summary_file}")
-
-    # 4. 生成BP专用报告
-    bp_txt_file = f"{output_dir}/bp_report_{timestamp}.txt"
-    bp_report = generate_bp_report(results, bp_txt_file)
-    print(f"✅ BP报告(TXT): {bp_txt_file}")
-
-    # 5. 生成BP专用HTML报告
-    bp_html_file = f"{output_dir}/bp_report_{timestamp}.html"
-    generate_bp_html_report(results, bp_html_file)
-    print(f"✅ BP报告(HTML): {bp_html_file}")
-
-    # 6. 生成BP专用Markdown报告（腾讯文档友好）
-    bp_md_file = f"{output_dir}/bp_report_{timestamp}.md"
-    generate_bp_markdown_report(results, bp_md_file)
-    print(f"✅ BP报告(MD): {bp_md_file}")
-
-    # 7. 打印BP报告到控制台
-    print("\n" + "=" * 60)
-    print("BP专用报告")
-    print("=" * 60)
-    print(bp_report)
+    # 所有报告共用同一份快照：results 抓取完成后不再修改，各生成函数只读；
+    # BP模型在派发前构建一次，三种BP报告共享
+    start = time.perf_counter()
+    bp_model = None
+    if any(report_format in BP_REPORT_FORMATS for report_format in formats):
+        bp_model = build_bp_model(results)
+    model_time = time.perf_counter() - start
+
+    output_files = {report_format: f"{output_dir}/{REPORT_ARTIFACTS[report_format][1].format(timestamp)}"
+                    for report_format in formats}
+    workers = max(1, min(workers, len(formats)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {report_format: executor.submit(render_artifact, report_format, results,
+                                                  output_files[report_format], bp_model)
+                   for report_format in formats}
+
+    # 按固定顺序汇报，单个报告失败不影响其余报告
+    print()
+    files = []
+    for report_format in formats:
+        label = REPORT_ARTIFACTS[report_format][0]
+        try:
+            elapsed = futures[report_format].result()
+        except Exception as e:
+            print(f"❌ {label}生成失败: {e}")
+            continue
+        print(f"✅ {label}: {output_files[report_format]} ({elapsed * 1000:.1f}ms)")
+        files.append(output_files[report_format])
+        if output_store is not None:
+            output_store.store(output_files[report_format])
+    total = time.perf_counter() - start
+    model_note = f"，其中BP模型 {model_time * 1000:.1f}ms" if bp_model is not None else ""
+    print(f"报告生成: {len(files)} 个文件，{workers} 线程，耗时 {total * 1000:.1f}ms{model_note}")
+    if output_store is not None:
+        if prune:
+            output_store.prune()
+        print(output_store.summary())
+    if fragment_cache is not None:
+        fragment_cache.flush()
+        print(fragment_cache.summary())
+
+    # 打印BP报告到控制台
+    if "bp_txt" in formats:
+        print("\n" + "=" * 60)
+        print("BP专用报告")
+        print("=" * 60)
+        write_bp_report(sys.stdout, bp_model)
+        print()
+
+    return files
+
+# ============== 输出目录管理 ==============
 
-    return json_file, html_file, summary_file, bp_txt_file, bp_html_file, bp_md_file
+# output/ 下由 save_results 生成的文件名：<前缀>_<YYYYmmdd_HHMMSS><扩展名>
+OUTPUT_FILE_PATTERN = re.compile(r"^(?P<prefix>.+)_(?P<stamp>\d{8}_\d{6})(?P<ext>\.\w+)$")
+
+class OutputStore:
+    """
+    output/ 目录的内容寻址存储与保留策略
+    - 每个文件按内容哈希存入 objects/<哈希前2位>/，带时间戳的文件名是指向它的硬链接，
+      内容完全相同的文件只占一份磁盘空间；报告带各自的生成时间，不与其他运行的报告共用
+    - 只清理登记过（在 objects/ 中有链接）的文件，手工放入或早于本功能生成的文件不动
+    - 每天只保留最后 retain_per_day 次运行的文件；超过 archive_after_days 天的运行只保留结果快照；
+      删除任何运行前先把其结果快照压缩进 archive/ 下按月滚动的 zip，报告可解压后用 --render 重新生成；
+      最新的一份结果快照始终留在 output/，供 --render 默认使用
+    - objects/ 中不再被任何文件引用的内容随之删除
+    """
+
+    def __init__(self, output_dir, retain_per_day=RETAIN_PER_DAY, archive_after_days=ARCHIVE_AFTER_DAYS):
+        self.output_dir = output_dir
+        self.objects_dir = os.path.join(output_dir, "objects")
+        self.archive_dir = os.path.join(output_dir, "archive")
+        self.retain_per_day = retain_per_day
+        self.archive_after_days = archive_after_days
+        self.shared = 0
+        self.saved_bytes = 0
+        self.removed = 0
+        self.archived = 0
+
+    @staticmethod
+    def content_digest(path):
+        """文件内容的 SHA-256"""
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def store(self, path):
+        """把新生成的文件登记到 objects/；已有相同内容时改为指向它的硬链接，返回是否复用"""
+        digest = self.content_digest(path)
+        object_path = os.path.join(self.objects_dir, digest[:2], digest + os.path.splitext(path)[1])
+        try:
+            if os.path.exists(object_path):
+                size = os.path.getsize(path)
+                os.remove(path)
+                os.link(object_path, path)
+                self.shared += 1
+                self.saved_bytes += size
+                return True
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.link(path, object_path)
+        except OSError as e:
+            # 文件系统不支持硬链接时保留普通文件，只是不去重
+            if not os.path.exists(path):
+                shutil.copyfile(object_path, path)
+            print(f"⚠️ 输出去重失败 {path}: {e}")
+        return False
+
+    def runs(self):
+        """output/ 中登记过的各次运行的文件：{时间戳: [文件名]}（硬链接数大于1即在 objects/ 中有内容）"""
+        runs = defaultdict(list)
+        for entry in os.scandir(self.output_dir):
+            match = OUTPUT_FILE_PATTERN.match(entry.name)
+            if match and entry.is_file() and entry.stat().st_nlink > 1:
+                runs[match.group("stamp")].append(entry.name)
+        return runs
+
+    def archive_snapshot(self, stamp, name):
+        """把一份结果快照加入该月的滚动归档（归档中已有相同内容时跳过）"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_file = os.path.join(self.archive_dir, f"dota2_analysis_{stamp[:6]}.zip")
+        with open(os.path.join(self.output_dir, name), 'rb') as f:
+            content = f.read()
+        crc = zlib.crc32(content)
+        with zipfile.ZipFile(archive_file, 'a', compression=zipfile.ZIP_DEFLATED) as archive:
+            if any(info.CRC == crc and info.file_size == len(content) for info in archive.infolist()):
+                return
+            archive.writestr(name, content)
+            self.archived += 1
+
+    def prune(self, now=None):
+        """按保留策略清理 output/，并删除不再被引用的内容"""
+        if self.retain_per_day <= 0:
+            return
+        now = now or datetime.now()
+        archive_before = (now - timedelta(days=self.archive_after_days)).strftime("%Y%m%d")
+        runs = self.runs()
+        snapshots = [name for names in runs.values() for name in names if name.startswith("dota2_analysis_")]
+        latest = max(snapshots, key=lambda name: OUTPUT_FILE_PATTERN.match(name).group("stamp"), default=None)
+        by_day = defaultdict(list)
+        for stamp in sorted(runs):
+            by_day[stamp[:8]].append(stamp)
+        for day, stamps in by_day.items():
+            kept = stamps[-self.retain_per_day:]
+            for stamp in stamps:
+                if stamp in kept and day >= archive_before:
+                    continue
+                for name in runs[stamp]:
+                    if name == latest:
+                        continue
+                    if name.startswith("dota2_analysis_"):
+                        self.archive_snapshot(stamp, name)
+                    os.remove(os.path.join(self.output_dir, name))
+                    self.removed += 1
+        self.collect_garbage()
+
+    def collect_garbage(self):
+        """删除 objects/ 中只剩自身一个链接（已无文件引用）的内容"""
+        if not os.path.isdir(self.objects_dir):
+            return
+        for shard in os.scandir(self.objects_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.stat().st_nlink <= 1:
+                    os.remove(entry.path)
+            if not os.listdir(shard.path):
+                os.rmdir(shard.path)
+
+    def summary(self):
+        """去重与清理统计"""
+        return (f"输出目录: 复用相同内容 {self.shared} 个文件 (节省 {self.saved_bytes / 1024:.0f} KB)，"
+                f"清理旧文件 {self.removed} 个，归档快照 {self.archived} 份")
+
+# 由入口创建；为 None 时不去重、不清理 output/
+output_store = None
+
+# ============== 离线重新生成 ==============
+
+LATEST_SNAPSHOT = "latest"  # --render 不带文件名时使用 output/ 中最新的结果
+# 结果快照：--render 不生成（新文件名带当前时间、内容却是旧数据，会被当成最新快照用于 --render/--diff）
+SNAPSHOT_FORMATS = ("json", "snapshot")
+# --render 可以重新生成的报告，未指定 --formats 时全部生成
+RENDER_FORMATS = tuple(report_format for report_format in REPORT_ARTIFACTS if report_format not in SNAPSHOT_FORMATS)
+
+def list_snapshots(output_dir=OUTPUT_DIR):
+    """
+    output_dir 中的结果快照，按时间从旧到新，每次运行一份；
+    同一次运行同时保存了JSON和二进制快照时取二进制快照
+    """
+    if not os.path.isdir(output_dir):
+        return []
+    runs = {}
+    for name in sorted(os.listdir(output_dir)):
+        stem, ext = os.path.splitext(name)
+        if name.startswith("dota2_analysis_") and ext in (".json", SNAPSHOT_SUFFIX):
+            if stem not in runs or ext == SNAPSHOT_SUFFIX:
+                runs[stem] = name
+    return [f"{output_dir}/{runs[stem]}" for stem in sorted(runs)]
+
+def latest_snapshot(output_dir=OUTPUT_DIR):
+    """output_dir 中最新的结果快照，没有时返回 None"""
+    snapshots = list_snapshots(output_dir)
+    return snapshots[-1] if snapshots else None
+
+def load_results_snapshot(snapshot_file):
+    """读取 save_results 保存的结果快照（JSON 或二进制），还原为与抓取结果相同的结构"""
+    if snapshot_file.endswith(SNAPSHOT_SUFFIX):
+        with SnapshotReader(snapshot_file) as reader:
+            return reader.load()
+    with open(snapshot_file, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    for team_data in results.values():
+        for player_data in team_data["players"].values():
+            if player_data.get("stats"):
+                restore_hero_usage(player_data["stats"])
+    return results
+
+def missing_report_fields(results, formats):
+    """快照中缺少的 stats 字段：{报告格式: [字段]}（快照来自只选了部分报告的运行时会出现）"""
+    present = None
+    for team_data in results.values():
+        for player_data in team_data["players"].values():
+            if player_data.get("stats"):
+                keys = set(player_data["stats"])
+                present = keys if present is None else present & keys
+    if present is None:
+        return {}
+    missing = {}
+    for report_format in formats:
+        fields = [field for field in REPORT_STATS_FIELDS[report_format] if field not in present]
+        if fields:
+            missing[report_format] = fields
+    return missing
+
+def render_snapshot(snapshot_file=None, formats=RENDER_FORMATS):
+    """由已保存的结果快照重新生成报告，不访问网络；返回生成的文件列表"""
+    start = time.perf_counter()
+    if snapshot_file is None:
+        snapshot_file = latest_snapshot()
+        if snapshot_file is None:
+            print(f"❌ {OUTPUT_DIR}/ 中没有 dota2_analysis_* 结果快照，请先运行一次完整分析")
+            return []
+    results = load_results_snapshot(snapshot_file)
+    players = sum(len(team_data["players"]) for team_data in results.values())
+    # 早期快照没有 data_hash，补算后报告片段同样可以缓存
+    for team_data in results.values():
+        for player_data in team_data["players"].values():
+            if "data_hash" not in player_data:
+                player_data["data_hash"] = player_data_hash(player_data)
+    print(f"📂 读取结果快照: {snapshot_file}（{len(results)} 支队伍，{players} 名选手，"
+          f"{(time.perf_counter() - start) * 1000:.1f}ms）")
+
+    for report_format in formats:
+        if report_format in SNAPSHOT_FORMATS:
+            print(f"⚠️ --render 不重新保存结果快照，跳过{REPORT_ARTIFACTS[report_format][0]}")
+    formats = [report_format for report_format in formats if report_format not in SNAPSHOT_FORMATS]
+    missing = missing_report_fields(results, formats)
+    for report_format, fields in missing.items():
+        print(f"⚠️ 快照缺少 {', '.join(fields)}，跳过{REPORT_ARTIFACTS[report_format][0]}")
+    formats = [report_format for report_format in formats if report_format not in missing]
+    if not formats:
+        return []
+
+    files = save_results(results, None, formats=formats, prune=False)
+    print(f"✅ 重新生成完成，总耗时 {(time.perf_counter() - start) * 1000:.1f}ms（未访问网络）")
+    return files
+
+# ============== 快照对比 ==============
+
+DIFF_MIN_WINRATE_CHANGE = 5  # 英雄胜率变化超过该百分点才列出
+
+def offline_hero_map():
+    """只读本地英雄快照的ID到名称映射（不访问网络，也不触发后台刷新）"""
+    table = load_hero_table()
+    return {hero['id']: hero['name'] for hero in table["heroes"]} if table else {}
+
+def hero_pool_counts(stats, hero_map):
+    """
+    选手各英雄的 {英雄名: (场次, 胜场)}，兼容两种 hero_usage 格式：
+    按 hero_id 存放的计数行，以及早期快照按英雄名存放的 {games, wins, ...}；
+    没有 hero_usage 的快照退回 top_heroes
+    """
+    hero_usage = stats.get("hero_usage")
+    if not hero_usage:
+        return {hero["hero"]: (hero["games"], hero["wins"]) for hero in stats.get("top_heroes", [])}
+    if all(isinstance(counts, dict) for counts in hero_usage.values()):
+        return {name: (counts["games"], counts["wins"]) for name, counts in hero_usage.items()}
+    return {hero_display_name(hero_map, int(hero_id)): (row[0], row[1]) for hero_id, row in hero_usage.items()}
+
+def snapshot_player_index(results):
+    """按阵容位置索引选手：{(account_id, 队伍名, 选手名): 选手数据}，同一账号可能出现在多支队伍"""
+    index = {}
+    for team_name, team_data in results.items():
+        for player_name, player_data in team_data["players"].items():
+            index[(player_data.get("account_id"), team_name, player_name)] = player_data
+    return index
+
+def hero_win_rate(games, wins):
+    return round(wins / games * 100, 1) if games > 0 else 0
+
+def diff_player(old_data, new_data, hero_map):
+    """对比同一名选手的两次数据，没有变化时返回 None"""
+    old_stats = old_data.get("stats")
+    new_stats = new_data.get("stats")
+    if not new_stats:
+        return {"error": new_data.get("error", "没有数据")} if old_stats else None
+    if not old_stats:
+        return {"recovered": True}
+
+    # 新增比赛：最近比赛中旧快照没有的场次；两次毫无重叠时说明新增的不止这些
+    old_ids = {match["match_id"] for match in old_stats.get("recent_matches", [])}
+    new_ids = [match["match_id"] for match in new_stats.get("recent_matches", [])]
+    new_matches = sum(1 for match_id in new_ids if match_id not in old_ids)
+    more_matches = bool(old_ids) and new_matches == len(new_ids) > 0
+
+    old_signature = {hero["hero"]: hero for hero in analyze_signature_heroes(old_stats)["signature"]}
+    new_signature = {hero["hero"]: hero for hero in analyze_signature_heroes(new_stats)["signature"]}
+
+    old_pool = hero_pool_counts(old_stats, hero_map)
+    new_pool = hero_pool_counts(new_stats, hero_map)
+    hero_changes = []
+    dropped = []
+    for hero, (old_games, old_wins) in old_pool.items():
+        new_games, new_wins = new_pool.get(hero, (0, 0))
+        if old_games >= BP_MIN_GAMES and new_games < BP_MIN_GAMES:
+            dropped.append((hero, old_games, new_games))
+        elif old_games >= BP_MIN_GAMES and (hero in old_signature) == (hero in new_signature):
+            # 招牌英雄的得失已单独列出，这里只列其余英雄的胜率变化
+            old_rate = hero_win_rate(old_games, old_wins)
+            new_rate = hero_win_rate(new_games, new_wins)
+            if abs(new_rate - old_rate) >= DIFF_MIN_WINRATE_CHANGE:
+                hero_changes.append((hero, old_rate, new_rate, new_games))
+    hero_changes.sort(key=lambda change: abs(change[2] - change[1]), reverse=True)
+
+    diff = {
+        "new_matches": new_matches,
+        "more_matches": more_matches,
+        "win_rate": (old_stats["win_rate"], new_stats["win_rate"]),
+        "kda_ratio": (old_stats["kda_ratio"], new_stats["kda_ratio"]),
+        "new_signature": [hero for name, hero in new_signature.items() if name not in old_signature],
+        "lost_signature": [name for name in old_signature if name not in new_signature],
+        "hero_changes": hero_changes,
+        "dropped": dropped,
+    }
+    changed = (new_matches or diff["win_rate"][0] != diff["win_rate"][1] or diff["new_signature"]
+               or diff["lost_signature"] or hero_changes or dropped)
+    return diff if changed else None
+
+def diff_snapshots(old_results, new_results, hero_map):
+    """
+    按选手对比两份快照：{"teams": {队伍名: [(选手名, 变化)]}, "joined": [...], "left": [...], "unchanged": N}
+    选手按阵容位置建索引，同一账号在多支队伍时每个位置各自对比
+    """
+    old_index = snapshot_player_index(old_results)
+    new_index = snapshot_player_index(new_results)
+    # 位置对不上的（转会、改名）再按账号配对，账号在剩余位置中仍有多个时按出现顺序依次配对
+    moved = {}
+    for key in old_index:
+        if key not in new_index and key[0]:
+            moved.setdefault(key[0], []).append(key)
+    teams = {}
+    joined = []
+    matched = set()
+    unchanged = 0
+    for key, new_data in new_index.items():
+        account_id, team_name, player_name = key
+        old_key = key if key in old_index else None
+        if old_key is None and moved.get(account_id):
+            old_key = moved[account_id].pop(0)
+        if old_key is None:
+            joined.append((team_name, player_name))
+            continue
+        matched.add(old_key)
+        diff = diff_player(old_index[old_key], new_data, hero_map)
+        if diff is None:
+            unchanged += 1
+        else:
+            teams.setdefault(team_name, []).append((player_name, diff))
+    left = [key[1:] for key in old_index if key not in matched]
+    return {"teams": teams, "joined": joined, "left": left, "unchanged": unchanged}
+
+def signed(value, digits=1):
+    """带正负号的变化量"""
+    return f"{value:+.{digits}f}"
+
+def write_snapshot_diff(out, diff, old_label, new_label):
+    """把快照对比写成适合直接贴到微信/飞书的文字"""
+    lines = LineWriter(out)
+    lines.append("=" * 40)
+    lines.append("📊 对手变化")
+    lines.append(f"⏰ {old_label} → {new_label}")
+    lines.append("=" * 40)
+
+    for team_name, players in diff["teams"].items():
+        lines.append(f"\n【{team_name}】")
+        for player_name, change in players:
+            if "error" in change:
+                lines.append(f"🎯 {player_name}: ⚠️ 本次{change['error']}")
+                continue
+            if "recovered" in change:
+                lines.append(f"🎯 {player_name}: 本次起有数据（上次快照中无数据）")
+                continue
+            old_rate, new_rate = change["win_rate"]
+            old_kda, new_kda = change["kda_ratio"]
+            matches = f"{change['new_matches']}+" if change["more_matches"] else str(change["new_matches"])
+            lines.append(f"🎯 {player_name}: 新增 {matches} 场 | 胜率 {old_rate}% → {new_rate}% "
+                         f"({signed(new_rate - old_rate)}) | KDA {old_kda} → {new_kda}")
+            for hero in change["new_signature"]:
+                lines.append(f"   🆕 新招牌: {hero['hero']} ({hero['games']}场 {hero['win_rate']}%)")
+            if change["lost_signature"]:
+                lines.append(f"   ❌ 不再是招牌: {', '.join(change['lost_signature'])}")
+            for hero, old_hero_rate, new_hero_rate, games in change["hero_changes"][:5]:
+                emoji = "📈" if new_hero_rate > old_hero_rate else "📉"
+                lines.append(f"   {emoji} {hero}: {old_hero_rate}% → {new_hero_rate}% "
+                             f"({signed(new_hero_rate - old_hero_rate)}，{games}场)")
+            if change["dropped"]:
+                dropped = ", ".join(f"{hero}({old_games}→{new_games}场)" for hero, old_games, new_games in change["dropped"])
+                lines.append(f"   💤 退出英雄池: {dropped}")
+
+    if diff["joined"]:
+        lines.append(f"\n🆕 新选手: {', '.join(f'{player}({team})' for team, player in diff['joined'])}")
+    if diff["left"]:
+        lines.append(f"👋 已不在名单: {', '.join(f'{player}({team})' for team, player in diff['left'])}")
+    if not diff["teams"] and not diff["joined"] and not diff["left"]:
+        lines.append("\n两份快照之间没有变化")
+    elif diff["unchanged"]:
+        lines.append(f"\n另有 {diff['unchanged']} 名选手没有变化")
+    out.write("\n")
+
+def snapshot_label(snapshot_file):
+    """快照文件名中的时间戳，作为对比标题"""
+    match = OUTPUT_FILE_PATTERN.match(os.path.basename(snapshot_file))
+    if not match:
+        return os.path.basename(snapshot_file)
+    return datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M")
+
+def compare_snapshots(old_file=None, new_file=None, out=None):
+    """
+    对比两份结果快照并输出变化（不访问网络）；
+    不指定时对比 output/ 中最新的两份，只指定一份时与最新的一份对比
+    """
+    out = out or sys.stdout
+    if new_file is None:
+        snapshots = list_snapshots()
+        if old_file is None:
+            if len(snapshots) < 2:
+                print(f"❌ {OUTPUT_DIR}/ 中少于两份结果快照，无法对比")
+                return False
+            old_file, new_file = snapshots[-2:]
+        elif snapshots:
+            new_file = snapshots[-1]
+        else:
+            print(f"❌ {OUTPUT_DIR}/ 中没有结果快照可供对比")
+            return False
+    old_results = load_results_snapshot(old_file)
+    new_results = load_results_snapshot(new_file)
+    start = time.perf_counter()
+    diff = diff_snapshots(old_results, new_results, offline_hero_map())
+    elapsed = time.perf_counter() - start
+    write_snapshot_diff(out, diff, snapshot_label(old_file), snapshot_label(new_file))
+    print(f"\n对比 {old_file} → {new_file}，耗时 {elapsed * 1000:.1f}ms", file=sys.stderr)
+    return True
 
 # ============== 入口 ==============
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Dota 2 玩家数据分析工具")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS,
+                        help=f"并发抓取线程数，1 为串行抓取 (默认: {FETCH_WORKERS})")
+    parser.add_argument("--max-age", type=float, default=None, metavar="SECONDS",
+                        help="接受不超过该秒数的缓存数据，覆盖各接口默认TTL（0 表示强制刷新）")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"不读写本地响应缓存 ({CACHE_FILE})")
+    parser.add_argument("--fragment-cache", action="store_true",
+                        help=f"缓存HTML报告片段 ({FRAGMENT_CACHE_FILE})，只重新生成数据变化的选手；"
+                             "几百名选手以上才有收益")
+    parser.add_argument("--full-sync", action="store_true",
+                        help=f"不使用本地比赛窗口 ({MATCH_STORE_FILE})，每次完整下载最近 {MATCHES_LIMIT} 场")
+    parser.add_argument("--lobby-type", type=int, default=None,
+                        help="只分析该房间类型的比赛（服务端过滤，7 为天梯）")
+    parser.add_argument("--game-mode", type=int, default=None,
+                        help="只分析该游戏模式的比赛（服务端过滤，22 为全英雄选择）")
+    parser.add_argument("--days", type=int, default=None,
+                        help="只分析最近N天的比赛（服务端过滤）")
+    parser.add_argument("--resume", type=float, nargs="?", const=RESUME_MAX_AGE, default=None, metavar="SECONDS",
+                        help=f"断点续传：跳过该秒数内已完成的玩家 (默认: {RESUME_MAX_AGE})")
+    parser.add_argument("--deep", type=int, nargs="?", const=DEEP_HISTORY_LIMIT, default=None, metavar="MATCHES",
+                        help=f"深度历史模式：分页下载并流式分析每名玩家最近N场比赛 (默认: {DEEP_HISTORY_LIMIT})，"
+                             "内存占用不随场数增长")
+    parser.add_argument("--analysis-workers", type=int, nargs="?", const=os.cpu_count(), default=ANALYSIS_WORKERS,
+                        metavar="N",
+                        help=f"用N个进程并行分析，与抓取重叠进行 (不带N时为CPU核数 {os.cpu_count()}，"
+                             f"默认: {ANALYSIS_WORKERS} 即在抓取线程中分析)")
+    parser.add_argument("--backend", choices=sorted(ANALYSIS_BACKENDS), default="python",
+                        help="比赛分析后端：python（逐场累计）或 numpy（列式向量化，适合长历史）")
+    parser.add_argument("--formats", nargs="+", choices=list(REPORT_ARTIFACTS), default=None, metavar="FORMAT",
+                        help=f"只生成这些报告，并只计算它们用到的统计 (可选: {', '.join(REPORT_ARTIFACTS)}；"
+                             "默认除 snapshot 外全部；--render 时不生成 json 与 snapshot)")
+    parser.add_argument("--render", nargs="?", const=LATEST_SNAPSHOT, default=None, metavar="SNAPSHOT",
+                        help=f"不抓取数据，由已保存的 dota2_analysis_* 快照（.json 或 {SNAPSHOT_SUFFIX}）重新生成报告 (默认: {OUTPUT_DIR}/ 中最新的一份)")
+    parser.add_argument("--diff", nargs="*", default=None, metavar="SNAPSHOT",
+                        help=f"不抓取数据，对比两份结果快照：不带参数时对比 {OUTPUT_DIR}/ 中最新的两份，"
+                             "一个参数时与最新的一份对比，两个参数时按 旧 新 顺序对比")
+    parser.add_argument("--retain-per-day", type=int, default=RETAIN_PER_DAY, metavar="N",
+                        help=f"{OUTPUT_DIR}/ 中每天保留最后N次运行的文件，更早的快照按月归档，0 表示不清理 (默认: {RETAIN_PER_DAY})")
+    parser.add_argument("--bp-min-games", type=int, default=None,
+                        help=f"招牌英雄最少场次 (默认: {BP_MIN_GAMES})")
+    parser.add_argument("--bp-high-winrate", type=int, default=None,
+                        help=f"招牌英雄/中威胁胜率阈值 (默认: {BP_HIGH_WINRATE})")
+    parser.add_argument("--bp-threat-winrate", type=int, default=None,
+                        help=f"高威胁胜率阈值 (默认: {BP_THREAT_WINRATE})")
+    args = parser.parse_args()
+    if args.backend == "numpy" and np is None:
+        parser.error("--backend numpy 需要先安装 numpy: pip install numpy")
+    if args.deep is not None and args.backend != "python":
+        parser.error("--deep 逐页流式累计，只支持 --backend python")
+    if args.deep is not None and args.analysis_workers:
+        parser.error("--deep 边下载边累计，不能与 --analysis-workers 同时使用")
+    if args.diff is not None and len(args.diff) > 2:
+        parser.error("--diff 最多指定两份快照（旧 新）")
+    return args
+
+def match_filters_from_args(args):
+    """由命令行参数构造比赛记录的服务端过滤参数"""
+    filters = {}
+    if args.lobby_type is not None:
+        filters["lobby_type"] = args.lobby_type
+    if args.game_mode is not None:
+        filters["game_mode"] = args.game_mode
+    if args.days is not None:
+        filters["date"] = args.days
+    return filters
+
+def apply_bp_thresholds(args):
+    """用命令行参数覆盖BP阈值（未指定的保持配置区的值）"""
+    global BP_MIN_GAMES, BP_HIGH_WINRATE, BP_THREAT_WINRATE
+    if args.bp_min_games is not None:
+        BP_MIN_GAMES = args.bp_min_games
+    if args.bp_high_winrate is not None:
+        BP_HIGH_WINRATE = args.bp_high_winrate
+    if args.bp_threat_winrate is not None:
+        BP_THREAT_WINRATE = args.bp_threat_winrate
+
 if __name__ == "__main__":
+    args = parse_args()
+    apply_bp_thresholds(args)
+    output_store = OutputStore(OUTPUT_DIR, retain_per_day=args.retain_per_day)
+    if args.fragment_cache:
+        fragment_cache = FragmentCache(FRAGMENT_CACHE_FILE)
+    if args.diff is not None:
+        try:
+            compared = compare_snapshots(*args.diff)
+        except Exception as e:
+            print(f"\n❌ 对比失败: {e}")
+            sys.exit(1)
+        sys.exit(0 if compared else 1)
+    if args.render is not None:
+        snapshot_file = None if args.render == LATEST_SNAPSHOT else args.render
+        try:
+            files = render_snapshot(snapshot_file, formats=args.formats or RENDER_FORMATS)
+        except Exception as e:
+            print(f"\n❌ 重新生成失败: {e}")
+            sys.exit(1)
+        for f in files:
+            print(f"  - {f}")
+        sys.exit(0 if files else 1)
+
+    formats = args.formats or list(DEFAULT_FORMATS)
+    if 2 * args.workers > HTTP_POOL_SIZE:
+        http_session = create_http_session(2 * args.workers)
+    if not args.no_cache:
+        response_cache = ResponseCache(CACHE_FILE, max_age=args.max_age)
+    if not args.full_sync:
+        match_store = MatchStore(MATCH_STORE_FILE)
+    checkpoint_store = CheckpointStore(CHECKPOINT_FILE)
     try:
-        results, hero_map = fetch_all_players_data()
-        files = save_results(results, hero_map)
+        results, hero_map = fetch_all_players_data(
+            workers=args.workers,
+            filters=match_filters_from_args(args),
+            backend=args.backend,
+            resume_max_age=args.resume,
+            deep=args.deep,
+            analysis_workers=args.analysis_workers,
+            fields=stats_fields_for_reports(formats)
+        )
+        files = save_results(results, hero_map, formats=formats)
 
         print("\n" + "=" * 60)
         print("✅ 数据分析完成!")
@@ -1626,7 +3520,8 @@ if __name__ == "__main__":
         for f in files:
             print(f"  - {f}")
 
-        print("\n💡 提示: 打开 bp_report_*.html 查看BP专用分析报告")
+        if "bp_html" in formats:
+            print("\n💡 提示: 打开 bp_report_*.html 查看BP专用分析报告")
 
     except KeyboardInterrupt:
         print("\n\n⚠️ 用户中断操作")
@@ -0,0 +1,783 @@
+"""
+Dota 2 分析工具 - 性能基准测试
+用合成数据对比各实现的耗时，并校验结果与参照实现一致
+
+用法:
+    python dota2_bench.py analysis --sizes 100 10000 1000000
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import dota2_analyzer as analyzer
+from dota2_analyzer import analyze_position
+
+# ============== 合成数据 ==============
+
+def make_hero_map(count=124):
+    """合成英雄ID到名称的映射（前若干个使用真实英雄名以覆盖位置分析）"""
+    names = list(analyzer.HERO_POSITIONS)
+    return {hero_id: names[hero_id - 1] if hero_id <= len(names) else f"Hero {hero_id}"
+            for hero_id in range(1, count + 1)}
+
+def make_matches(count, seed=0, hero_count=124):
+    """合成 count 场比赛记录（字段与 OpenDota /players/{id}/matches 一致）"""
+    rnd = random.Random(seed)
+    hero_ids = list(range(1, hero_count + 1)) + [0]  # 0 模拟缺失的英雄
+    weights = [1.0 / (i + 1) for i in range(len(hero_ids))]  # 英雄使用呈长尾分布
+    heroes = rnd.choices(hero_ids, weights=weights, k=count)
+    matches = []
+    start_time = 1760000000
+    match_id = 8000000000
+    for i in range(count):
+        match_id -= rnd.randint(1, 5000)
+        start_time -= rnd.randint(600, 40000)
+        matches.append({
+            "match_id": match_id,
+            "hero_id": heroes[i],
+            "player_slot": rnd.choice((0, 1, 2, 3, 4, 128, 129, 130, 131, 132)),
+            "radiant_win": rnd.random() < 0.5,
+            "kills": rnd.randint(0, 20),
+            "deaths": rnd.randint(0, 15) if rnd.random() > 0.02 else None,
+            "assists": rnd.randint(0, 30),
+            "duration": rnd.randint(900, 3600),
+            "start_time": start_time,
+        })
+    return matches
+
+def make_results(players, matches_per_player=100, team_size=5, seed=0):
+    """合成整个联赛的 results（结构与 fetch_all_players_data 的返回值一致），seed 不同则比赛不同"""
+    hero_map = make_hero_map()
+    results = {}
+    for index in range(players):
+        team = results.setdefault(f"队伍{index // team_size + 1}", {"color": "#FFF2CC", "players": {}})
+        stats = analyzer.analyze_matches(make_matches(matches_per_player, seed=seed + index), hero_map)
+        player_data = {
+            "account_id": 100000 + index,
+            "profile": {},
+            "rank": analyzer.parse_rank_tier(50 + index % 30),
+            "stats": stats,
+        }
+        player_data["data_hash"] = analyzer.player_data_hash(player_data)
+        team["players"][f"选手{index + 1}"] = player_data
+    return results
+
+def timed(func, *args, repeat=1):
+    """返回 (最短耗时秒数, 最后一次的返回值)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def same_result(a, b):
+    """两个结果序列化后完全一致（包括键顺序）"""
+    return json.dumps(a, default=str) == json.dumps(b, default=str)
+
+def with_named_hero_usage(stats, hero_map):
+    """把按 hero_id 存放的 hero_usage 展开为旧版的按英雄名格式，便于与参照实现比较"""
+    return {**stats, "hero_usage": analyzer.hero_usage_by_name(stats["hero_usage"], hero_map)}
+
+# ============== 参照实现（三次遍历的旧版分析） ==============
+
+def legacy_analyze_trend(matches, hero_map):
+    """分析近期状态趋势 (最近20场 vs 前80场)"""
+    if len(matches) < 20:
+        return None
+
+    recent_matches = matches[:20]
+    older_matches = matches[20:] if len(matches) > 20 else []
+
+    def calc_stats(match_list):
+        if not match_list:
+            return None
+        wins = 0
+        total_kills = 0
+        total_deaths = 0
+        total_assists = 0
+
+        for match in match_list:
+            player_slot = match.get('player_slot', 0)
+            radiant_win = match.get('radiant_win', False)
+            is_radiant = player_slot < 128
+            won = (is_radiant and radiant_win) or (not is_radiant and not radiant_win)
+            if won:
+                wins += 1
+
+            total_kills += match.get('kills', 0) or 0
+            total_deaths += match.get('deaths', 0) or 0
+            total_assists += match.get('assists', 0) or 0
+
+        count = len(match_list)
+        kda = round((total_kills + total_assists) / max(total_deaths, 1), 2)
+        return {
+            "games": count,
+            "wins": wins,
+            "win_rate": round(wins / count * 100, 1),
+            "avg_kills": round(total_kills / count, 1),
+            "avg_deaths": round(total_deaths / count, 1),
+            "avg_assists": round(total_assists / count, 1),
+            "kda": kda
+        }
+
+    recent_stats = calc_stats(recent_matches)
+    older_stats = calc_stats(older_matches) if older_matches else None
+
+    # 计算趋势
+    trend = {
+        "recent": recent_stats,
+        "older": older_stats,
+        "trend_direction": "stable"
+    }
+
+    if older_stats:
+        win_rate_diff = recent_stats["win_rate"] - older_stats["win_rate"]
+        kda_diff = recent_stats["kda"] - older_stats["kda"]
+
+        trend["win_rate_change"] = round(win_rate_diff, 1)
+        trend["kda_change"] = round(kda_diff, 2)
+
+        # 判断趋势方向
+        if win_rate_diff > 5 and kda_diff > 0.3:
+            trend["trend_direction"] = "up"
+            trend["trend_emoji"] = "🔥"
+            trend["trend_text"] = "状态上升"
+        elif win_rate_diff < -5 and kda_diff < -0.3:
+            trend["trend_direction"] = "down"
+            trend["trend_emoji"] = "📉"
+            trend["trend_text"] = "状态下滑"
+        else:
+            trend["trend_direction"] = "stable"
+            trend["trend_emoji"] = "➡️"
+            trend["trend_text"] = "状态稳定"
+
+    return trend
+
+def legacy_analyze_game_duration(matches, hero_map):
+    """分析不同时长对局的表现"""
+    duration_stats = {
+        "early": {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0},  # <30分钟
+        "mid": {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0},    # 30-45分钟
+        "late": {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0}    # >45分钟
+    }
+
+    for match in matches:
+        duration = match.get('duration', 0) / 60  # 转换为分钟
+
+        if duration < 30:
+            category = "early"
+        elif duration <= 45:
+            category = "mid"
+        else:
+            category = "late"
+
+        player_slot = match.get('player_slot', 0)
+        radiant_win = match.get('radiant_win', False)
+        is_radiant = player_slot < 128
+        won = (is_radiant and radiant_win) or (not is_radiant and not radiant_win)
+
+        duration_stats[category]["games"] += 1
+        if won:
+            duration_stats[category]["wins"] += 1
+        duration_stats[category]["kills"] += match.get('kills', 0) or 0
+        duration_stats[category]["deaths"] += match.get('deaths', 0) or 0
+        duration_stats[category]["assists"] += match.get('assists', 0) or 0
+
+    # 计算各时段的统计数据
+    result = {}
+    labels = {
+        "early": "早期(<30分钟)",
+        "mid": "中期(30-45分钟)",
+        "late": "后期(>45分钟)"
+    }
+
+    for period, stats in duration_stats.items():
+        games = stats["games"]
+        if games > 0:
+            result[period] = {
+                "label": labels[period],
+                "games": games,
+                "wins": stats["wins"],
+                "win_rate": round(stats["wins"] / games * 100, 1),
+                "kda": round((stats["kills"] + stats["assists"]) / max(stats["deaths"], 1), 2)
+            }
+        else:
+            result[period] = {
+                "label": labels[period],
+                "games": 0,
+                "wins": 0,
+                "win_rate": 0,
+                "kda": 0
+            }
+
+    # 找出最强时段
+    best_period = max(result.keys(), key=lambda x: result[x]["win_rate"] if result[x]["games"] >= 5 else 0)
+    result["best_period"] = best_period
+    result["best_period_label"] = labels[best_period]
+
+    return result
+
+def legacy_analyze_matches(matches, hero_map):
+    """分析比赛数据（增强版）"""
+    if not matches:
+        return None
+
+    stats = {
+        "total_matches": len(matches),
+        "wins": 0,
+        "losses": 0,
+        "total_kills": 0,
+        "total_deaths": 0,
+        "total_assists": 0,
+        "hero_usage": defaultdict(lambda: {"games": 0, "wins": 0, "kills": 0, "deaths": 0, "assists": 0}),
+        "recent_matches": []
+    }
+
+    for match in matches:
+        hero_id = match.get('hero_id', 0)
+        hero_name = hero_map.get(hero_id, f"Unknown({hero_id})")
+
+        player_slot = match.get('player_slot', 0)
+        radiant_win = match.get('radiant_win', False)
+        is_radiant = player_slot < 128
+        won = (is_radiant and radiant_win) or (not is_radiant and not radiant_win)
+
+        if won:
+            stats["wins"] += 1
+            stats["hero_usage"][hero_name]["wins"] += 1
+        else:
+            stats["losses"] += 1
+
+        kills = match.get('kills', 0) or 0
+        deaths = match.get('deaths', 0) or 0
+        assists = match.get('assists', 0) or 0
+
+        stats["total_kills"] += kills
+        stats["total_deaths"] += deaths
+        stats["total_assists"] += assists
+
+        stats["hero_usage"][hero_name]["games"] += 1
+        stats["hero_usage"][hero_name]["kills"] += kills
+        stats["hero_usage"][hero_name]["deaths"] += deaths
+        stats["hero_usage"][hero_name]["assists"] += assists
+
+        if len(stats["recent_matches"]) < 10:
+            stats["recent_matches"].append({
+                "match_id": match.get('match_id'),
+                "hero": hero_name,
+                "kda": f"{kills}/{deaths}/{assists}",
+                "won": won,
+                "duration": match.get('duration', 0) // 60,
+                "start_time": datetime.fromtimestamp(match.get('start_time', 0)).strftime('%Y-%m-%d %H:%M') if match.get('start_time') else "N/A"
+            })
+
+    # 计算基础统计
+    total = stats["total_matches"]
+    if total > 0:
+        stats["avg_kills"] = round(stats["total_kills"] / total, 2)
+        stats["avg_deaths"] = round(stats["total_deaths"] / total, 2)
+        stats["avg_assists"] = round(stats["total_assists"] / total, 2)
+        stats["win_rate"] = round(stats["wins"] / total * 100, 2)
+
+        if stats["total_deaths"] > 0:
+            stats["kda_ratio"] = round((stats["total_kills"] + stats["total_assists"]) / stats["total_deaths"], 2)
+        else:
+            stats["kda_ratio"] = stats["total_kills"] + stats["total_assists"]
+
+    # 排序英雄
+    sorted_heroes = sorted(stats["hero_usage"].items(), key=lambda x: x[1]["games"], reverse=True)
+    stats["top_heroes"] = []
+    for hero_name, hero_stats in sorted_heroes[:10]:
+        games = hero_stats["games"]
+        wins = hero_stats["wins"]
+        win_rate = round(wins / games * 100, 2) if games > 0 else 0
+        avg_kda = f"{round(hero_stats['kills']/games, 1)}/{round(hero_stats['deaths']/games, 1)}/{round(hero_stats['assists']/games, 1)}" if games > 0 else "0/0/0"
+
+        stats["top_heroes"].append({
+            "hero": hero_name,
+            "games": games,
+            "wins": wins,
+            "win_rate": win_rate,
+            "avg_kda": avg_kda
+        })
+
+    # 新增分析
+    stats["position_analysis"] = analyze_position(stats["hero_usage"])
+    stats["trend_analysis"] = legacy_analyze_trend(matches, hero_map)
+    stats["duration_analysis"] = legacy_analyze_game_duration(matches, hero_map)
+
+    # 转换defaultdict为普通dict，确保JSON序列化正常
+    stats["hero_usage"] = dict(stats["hero_usage"])
+
+    return stats
+
+
+# ============== 基准测试 ==============
+
+def bench_analysis(sizes, repeat):
+    """单次遍历分析 vs 旧版三次遍历分析"""
+    hero_map = make_hero_map()
+    print(f"{'场次':>10} {'旧版(秒)':>12} {'单次遍历(秒)':>14} {'加速比':>8}  结果一致")
+    for size in sizes:
+        matches = make_matches(size, seed=size)
+        legacy_time, expected = timed(legacy_analyze_matches, matches, hero_map, repeat=repeat)
+        fused_time, actual = timed(analyzer.analyze_matches, matches, hero_map, repeat=repeat)
+        actual = with_named_hero_usage(actual, hero_map)
+        print(f"{size:>10} {legacy_time:>12.4f} {fused_time:>14.4f} {legacy_time / fused_time:>7.2f}x  "
+              f"{'✅' if same_result(expected, actual) else '❌'}")
+
+def bench_numpy(sizes, repeat):
+    """NumPy 列式后端 vs 纯 Python 单次遍历"""
+    if analyzer.np is None:
+        print("未安装 numpy，跳过")
+        return
+    hero_map = make_hero_map()
+    print(f"{'场次':>10} {'Python(秒)':>12} {'NumPy含转换(秒)':>16} {'列式转换(秒)':>13} {'向量化统计(秒)':>15}  结果一致")
+    for size in sizes:
+        matches = make_matches(size, seed=size)
+        python_time, expected = timed(analyzer.analyze_matches, matches, hero_map, repeat=repeat)
+        numpy_time, actual = timed(analyzer.analyze_matches_numpy, matches, hero_map, repeat=repeat)
+        convert_time, columns = timed(analyzer.matches_to_columns, matches, repeat=repeat)
+        kernel_time, _ = timed(analyzer.analyze_columns, columns, hero_map, matches[:10], repeat=repeat)
+        print(f"{size:>10} {python_time:>12.4f} {numpy_time:>16.4f} {convert_time:>13.4f} {kernel_time:>15.4f}  "
+              f"{'✅' if same_result(expected, actual) else '❌'}")
+
+def retained_bytes(build):
+    """build() 返回的对象在构建完成后仍占用的内存（tracemalloc 统计）"""
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+def bench_results_memory(players, matches_per_player):
+    """整个联赛 results 中各玩家 stats 的常驻内存：按英雄名的 dict vs 按 hero_id 的计数行"""
+    hero_map = make_hero_map()
+    histories = [make_matches(matches_per_player, seed=seed) for seed in range(players)]
+    legacy = retained_bytes(lambda: [legacy_analyze_matches(m, hero_map) for m in histories])
+    current = retained_bytes(lambda: [analyzer.analyze_matches(m, hero_map) for m in histories])
+    print(f"{players} 名玩家 × {matches_per_player} 场")
+    print(f"  按英雄名 dict: {legacy / 1024:>10.1f} KB")
+    print(f"  按 hero_id 行: {current / 1024:>10.1f} KB  ({current / legacy:.0%})")
+
+def start_stand_in_server(payload):
+    """
+    在后台线程启动一个本地 HTTP/1.1 服务（支持长连接与 gzip），代替 OpenDota 返回 payload
+    payload 也可以是函数：以查询参数 dict 调用，返回该次请求的响应。
+    编码后的响应按 URL 缓存，预热后服务端不再分配内存，不影响同进程内的 tracemalloc 统计
+    """
+    def encode(value):
+        body = json.dumps(value).encode()
+        return body, gzip.compress(body)
+
+    fixed = None if callable(payload) else encode(payload)
+    encoded = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # 头和正文分两次写出，长连接下避免 Nagle+延迟确认的 40ms 停顿
+
+        def do_GET(self):
+            if fixed is None:
+                if self.path not in encoded:
+                    query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                    encoded[self.path] = encode(payload(query))
+                body, compressed = encoded[self.path]
+            else:
+                body, compressed = fixed
+            data = compressed if "gzip" in self.headers.get("Accept-Encoding", "") else body
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            if data is compressed:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def bench_session(requests_count, matches_per_response):
+    """每次新建连接的 requests.get vs 共享连接池会话"""
+    server = start_stand_in_server(make_matches(matches_per_response))
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/players/1/matches"
+
+    def bare():
+        for _ in range(requests_count):
+            requests.get(url, timeout=30).json()
+
+    def pooled():
+        session = analyzer.create_http_session()
+        for _ in range(requests_count):
+            session.get(url, timeout=30).json()
+
+    bare_time, _ = timed(bare)
+    pooled_time, _ = timed(pooled)
+    server.shutdown()
+    print(f"本地服务 {requests_count} 次请求（每次 {matches_per_response} 场比赛）")
+    print(f"  requests.get:  {bare_time / requests_count * 1000:>8.2f} ms/次")
+    print(f"  连接池会话:    {pooled_time / requests_count * 1000:>8.2f} ms/次  ({bare_time / pooled_time:.2f}x)")
+    print("  注: 本地服务不走 TLS，对 OpenDota 的 HTTPS 请求每次还能额外省去一次 TLS 握手")
+
+def peak_bytes(run):
+    """run() 执行期间的内存峰值（tracemalloc 统计）"""
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def start_paged_server(count):
+    """启动按 offset/limit 分页返回 count 场合成比赛的本地替身服务，并让 analyzer 指向它"""
+    history = make_matches(count, seed=1)
+    server = start_stand_in_server(
+        lambda query: history[int(query.get("offset", 0)):][:int(query.get("limit", 100))]
+    )
+    analyzer.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/api"
+    analyzer.rate_limiter = analyzer.TokenBucket(10 ** 9, 10 ** 6)  # 本地服务不限流
+    return server
+
+def bench_stream(sizes):
+    """单个大响应：response.json() 整体解析 vs 流式逐场解析直接累计（内存峰值）"""
+    hero_map = make_hero_map()
+    server = start_paged_server(max(sizes))
+    print(f"{'场次':>8} {'整体解析峰值(KB)':>16} {'流式解析峰值(KB)':>16} {'整体(秒)':>9} {'流式(秒)':>9}  结果一致")
+    for size in sizes:
+        def whole():
+            return analyzer.analyze_matches(analyzer.get_player_matches(1, size), hero_map)
+
+        def streamed():
+            accumulator = analyzer.MatchAccumulator(hero_map)
+            accumulator.add(analyzer.stream_player_matches(1, size))
+            return accumulator.summarize()
+
+        whole()  # 预热替身服务的响应缓存
+        whole_time, expected = timed(whole)
+        streamed_time, actual = timed(streamed)
+        whole_peak = peak_bytes(whole)
+        streamed_peak = peak_bytes(streamed)
+        print(f"{size:>8} {whole_peak / 1024:>16.1f} {streamed_peak / 1024:>16.1f} {whole_time:>9.3f} {streamed_time:>9.3f}  "
+              f"{'✅' if same_result(expected, actual) else '❌'}")
+    server.shutdown()
+
+def bench_deep(sizes, page_size):
+    """深度历史：分页流式累计 vs 一次下载全部比赛再分析（本地替身服务，内存峰值与吞吐）"""
+    hero_map = make_hero_map()
+    server = start_paged_server(max(sizes))
+
+    print(f"每页 {page_size} 场")
+    print(f"{'场次':>8} {'整表峰值(KB)':>14} {'流式峰值(KB)':>14} {'流式吞吐(场/秒)':>16}  结果一致")
+    for size in sizes:
+        def whole():
+            return analyzer.analyze_matches(analyzer.get_player_matches(1, size), hero_map)
+
+        def streamed():
+            accumulator = analyzer.MatchAccumulator(hero_map)
+            accumulator.add(analyzer.iter_match_history(1, size, page_size=page_size))
+            return accumulator.summarize()
+
+        expected = whole()  # 同时预热替身服务的响应缓存
+        streamed_time, actual = timed(streamed)
+        whole_peak = peak_bytes(whole)
+        streamed_peak = peak_bytes(streamed)
+        print(f"{size:>8} {whole_peak / 1024:>14.1f} {streamed_peak / 1024:>14.1f} {size / streamed_time:>16.0f}  "
+              f"{'✅' if same_result(expected, actual) else '❌'}")
+    server.shutdown()
+
+def bench_reports(sizes):
+    """各报告流式写入文件的耗时与内存峰值（不含 results 本身），应随选手数线性增长"""
+    def write_summary(results, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            analyzer.write_wechat_summary(f, results)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        print("BP报告使用预先构建的BP模型（与 save_results 相同），模型本身不计入")
+        print(f"{'报告':<14} {'选手数':>6} {'耗时(毫秒)':>10} {'每人(微秒)':>10} {'内存峰值(KB)':>12} {'文件(KB)':>9}")
+        for size in sizes:
+            results = make_results(size)
+            bp_model = analyzer.build_bp_model(results)
+            reports = {
+                "HTML报告": analyzer.generate_html_report,
+                "微信摘要": write_summary,
+                "BP报告(TXT)": lambda results, path: analyzer.generate_bp_report(results, path, bp_model),
+                "BP报告(HTML)": lambda results, path: analyzer.generate_bp_html_report(results, path, bp_model),
+                "BP报告(MD)": lambda results, path: analyzer.generate_bp_markdown_report(results, path, bp_model),
+            }
+            for name, render in reports.items():
+                path = os.path.join(output_dir, "report")
+                elapsed, _ = timed(render, results, path, repeat=3)
+                peak = peak_bytes(lambda: render(results, path))
+                print(f"{name:<14} {size:>6} {elapsed * 1000:>10.1f} {elapsed / size * 1e6:>10.1f} "
+                      f"{peak / 1024:>12.1f} {os.path.getsize(path) / 1024:>9.1f}")
+
+def bench_snapshot(sizes, files, repeat):
+    """JSON快照 vs 带索引的二进制快照：文件大小、整体读取、只读一支队伍/一名选手的耗时"""
+    sources = [(f"合成 {size} 人", lambda size=size: make_results(size)) for size in sizes]
+    sources += [(os.path.basename(path), lambda path=path: analyzer.load_results_snapshot(path)) for path in files]
+    with tempfile.TemporaryDirectory() as output_dir:
+        json_path = os.path.join(output_dir, "snapshot.json")
+        binary_path = os.path.join(output_dir, "snapshot" + analyzer.SNAPSHOT_SUFFIX)
+        print(f"{'快照':<36} {'格式':<6} {'大小(KB)':>9} {'整体读取(毫秒)':>14} {'一支队伍(毫秒)':>14} {'一名选手(毫秒)':>14}")
+        for label, build in sources:
+            results = build()
+            analyzer.save_json_results(results, json_path)
+            analyzer.save_binary_snapshot(results, binary_path)
+            team_name = list(results)[-1]
+            player_name = list(results[team_name]["players"])[-1]
+
+            def json_team():
+                return analyzer.load_results_snapshot(json_path)[team_name]
+
+            def json_player():
+                return json_team()["players"][player_name]
+
+            def binary_team():
+                with analyzer.SnapshotReader(binary_path) as reader:
+                    return reader.team(team_name)
+
+            def binary_player():
+                with analyzer.SnapshotReader(binary_path) as reader:
+                    return reader.player(team_name, player_name)
+
+            def binary_load():
+                with analyzer.SnapshotReader(binary_path) as reader:
+                    return reader.load()
+
+            rows = {
+                "JSON": (json_path, lambda: analyzer.load_results_snapshot(json_path), json_team, json_player),
+                "二进制": (binary_path, binary_load, binary_team, binary_player),
+            }
+            loaded = {}
+            for name, (path, load, team, player) in rows.items():
+                load_time, loaded[name] = timed(load, repeat=repeat)
+                team_time, _ = timed(team, repeat=repeat)
+                player_time, _ = timed(player, repeat=repeat)
+                print(f"{label:<36} {name:<6} {os.path.getsize(path) / 1024:>9.1f} {load_time * 1000:>14.2f} "
+                      f"{team_time * 1000:>14.2f} {player_time * 1000:>14.2f}")
+            assert same_result(loaded["JSON"], loaded["二进制"]), "二进制快照读回的结果与JSON不一致"
+
+class SimulatedClock(datetime):
+    """模拟时钟：替换 analyzer.datetime，使 save_results 按模拟时间生成文件名"""
+    current = datetime(2026, 1, 1)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+def directory_usage(path):
+    """目录下的文件数与实际占用字节数（硬链接只算一次）"""
+    inodes = {}
+    files = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            stat = os.stat(os.path.join(root, name))
+            inodes[(stat.st_dev, stat.st_ino)] = stat.st_size
+            files += 1
+    return files, sum(inodes.values())
+
+def bench_output(days, runs_per_day, players, change_every):
+    """
+    模拟一个赛季每小时刷新：output/ 的可见文件数与磁盘占用应保持有界，
+    每次运行的报告都应带本次运行的生成时间（去重不能换成旧运行的报告）
+    """
+    results = make_results(players)
+    player_stats = next(iter(results.values()))["players"]
+    player_stats = next(iter(player_stats.values()))["stats"]
+    original_datetime = analyzer.datetime
+    original_output_dir = analyzer.OUTPUT_DIR
+    with tempfile.TemporaryDirectory() as output_dir:
+        analyzer.datetime = SimulatedClock
+        analyzer.OUTPUT_DIR = output_dir
+        analyzer.output_store = analyzer.OutputStore(output_dir)
+        unmanaged_bytes = 0
+        stale_reports = 0
+        print(f"每天 {runs_per_day} 次，{players} 名选手，每 {change_every} 次运行数据变化一次；"
+              f"保留策略: 每天 {analyzer.RETAIN_PER_DAY} 次，{analyzer.ARCHIVE_AFTER_DAYS} 天后归档")
+        print(f"{'天数':>4} {'运行次数':>8} {'可见文件':>8} {'内容对象':>8} {'归档':>4} "
+              f"{'占用(MB)':>9} {'不清理(MB)':>11} {'列目录(微秒)':>12}")
+        try:
+            for day in range(1, days + 1):
+                for hour in range(runs_per_day):
+                    run = (day - 1) * runs_per_day + hour
+                    SimulatedClock.current = datetime(2026, 1, 1) + timedelta(days=day - 1, hours=hour * 24 / runs_per_day)
+                    if run % change_every == 0:
+                        player_stats["win_rate"] = round(player_stats["win_rate"] + 0.1, 1)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        files = analyzer.save_results(results, None)
+                    unmanaged_bytes += sum(os.path.getsize(path) for path in files)
+                    generated_at = SimulatedClock.current.strftime("%Y-%m-%d %H:%M").encode()
+                    for path in files:
+                        if not path.endswith((".json", analyzer.SNAPSHOT_SUFFIX)):
+                            with open(path, 'rb') as f:
+                                stale_reports += generated_at not in f.read()
+                if day % 10 == 0 or day == days:
+                    listing, runs = timed(analyzer.OutputStore(output_dir).runs, repeat=3)
+                    visible = sum(len(names) for names in runs.values())
+                    objects, _ = directory_usage(os.path.join(output_dir, "objects"))
+                    archives = len(os.listdir(os.path.join(output_dir, "archive"))) \
+                        if os.path.isdir(os.path.join(output_dir, "archive")) else 0
+                    _, used = directory_usage(output_dir)
+                    print(f"{day:>4} {day * runs_per_day:>8} {visible:>8} {objects:>8} {archives:>4} "
+                          f"{used / 1e6:>9.1f} {unmanaged_bytes / 1e6:>11.1f} {listing * 1e6:>12.0f}")
+            print(f"生成时间不是本次运行的报告: {stale_reports} 个 {'✅' if not stale_reports else '❌'}")
+        finally:
+            analyzer.datetime = original_datetime
+            analyzer.OUTPUT_DIR = original_output_dir
+            analyzer.output_store = None
+
+def bench_diff(sizes, repeat):
+    """两份联赛快照逐选手、逐英雄对比的耗时（按账号建索引，应随选手数线性增长）"""
+    hero_map = make_hero_map()
+    print(f"{'选手数':>6} {'对比(毫秒)':>10} {'输出(毫秒)':>10} {'有变化选手':>10}")
+    for size in sizes:
+        old_results = make_results(size)
+        new_results = make_results(size, seed=size)
+        diff_time, diff = timed(analyzer.diff_snapshots, old_results, new_results, hero_map, repeat=repeat)
+        write_time, _ = timed(lambda: analyzer.write_snapshot_diff(io.StringIO(), diff, "旧", "新"), repeat=repeat)
+        changed = sum(len(players) for players in diff["teams"].values())
+        print(f"{size:>6} {diff_time * 1000:>10.1f} {write_time * 1000:>10.1f} {changed:>10}")
+
+def bench_fragments(sizes, repeat):
+    """HTML报告与BP HTML报告在无缓存、冷缓存、无变化、1名选手变化时的耗时与重新生成的片段数"""
+    print(f"{'选手数':>6} {'场景':<12} {'耗时(毫秒)':>10} {'重新生成片段':>12}")
+    with tempfile.TemporaryDirectory() as output_dir:
+        for size in sizes:
+            results = make_results(size)
+            changed_player = next(iter(next(iter(results.values()))["players"].values()))
+
+            def render():
+                analyzer.generate_html_report(results, os.path.join(output_dir, "report.html"))
+                analyzer.generate_bp_html_report(results, os.path.join(output_dir, "bp_report.html"))
+                if analyzer.fragment_cache is not None:
+                    analyzer.fragment_cache.flush()
+
+            def change_one_player():
+                changed_player["stats"]["win_rate"] = round(changed_player["stats"]["win_rate"] + 0.1, 1)
+                changed_player["data_hash"] = analyzer.player_data_hash(changed_player)
+
+            def measure(label, before=None):
+                times = []
+                misses = 0
+                for _ in range(repeat):
+                    if before is not None:
+                        before()
+                    cache = analyzer.fragment_cache
+                    misses_before = cache.misses if cache is not None else 0
+                    start = time.perf_counter()
+                    render()
+                    times.append(time.perf_counter() - start)
+                    misses = cache.misses - misses_before if cache is not None else "-"
+                print(f"{size:>6} {label:<12} {min(times) * 1000:>10.2f} {misses:>12}")
+
+            analyzer.fragment_cache = None
+            measure("无缓存")
+            cache_file = os.path.join(output_dir, f"fragments_{size}.sqlite3")
+            try:
+                def reset_cache():
+                    if os.path.exists(cache_file):
+                        os.remove(cache_file)
+                    analyzer.fragment_cache = analyzer.FragmentCache(cache_file)
+
+                measure("冷缓存", reset_cache)
+                measure("无变化")
+                measure("1名选手变化", change_one_player)
+            finally:
+                analyzer.fragment_cache = None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dota 2 分析工具性能基准测试")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    analysis = subparsers.add_parser("analysis", help="单次遍历分析内核 vs 旧版三次遍历")
+    analysis.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    analysis.add_argument("--repeat", type=int, default=3)
+
+    memory = subparsers.add_parser("memory", help="results 中英雄计数的常驻内存")
+    memory.add_argument("--players", type=int, default=400)
+    memory.add_argument("--matches", type=int, default=1000)
+
+    session = subparsers.add_parser("session", help="共享连接池会话 vs 每次新建连接（本地替身服务）")
+    session.add_argument("--requests", type=int, default=300)
+    session.add_argument("--matches", type=int, default=100)
+
+    deep = subparsers.add_parser("deep", help="深度历史分页流式累计的内存峰值与吞吐（本地替身服务）")
+    deep.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20_000])
+    deep.add_argument("--page-size", type=int, default=analyzer.DEEP_PAGE_SIZE)
+
+    stream = subparsers.add_parser("stream", help="大响应整体解析 vs 流式逐场解析的内存峰值（本地替身服务）")
+    stream.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 50_000])
+
+    reports = subparsers.add_parser("reports", help="各报告流式写入的耗时与内存峰值")
+    reports.add_argument("--sizes", type=int, nargs="+", default=[40, 400, 4000])
+
+    snapshot = subparsers.add_parser("snapshot", help="JSON快照 vs 带索引的二进制快照的大小与读取耗时")
+    snapshot.add_argument("files", nargs="*", help="另外测试的已保存 dota2_analysis_*.json")
+    snapshot.add_argument("--sizes", type=int, nargs="+", default=[40, 400, 4000])
+    snapshot.add_argument("--repeat", type=int, default=3)
+
+    output = subparsers.add_parser("output", help="模拟赛季每小时刷新时 output/ 的文件数与磁盘占用")
+    output.add_argument("--days", type=int, default=30)
+    output.add_argument("--runs-per-day", type=int, default=24)
+    output.add_argument("--players", type=int, default=10)
+    output.add_argument("--change-every", type=int, default=6, help="每N次运行数据变化一次")
+
+    diff = subparsers.add_parser("diff", help="两份联赛快照逐选手、逐英雄对比的耗时")
+    diff.add_argument("--sizes", type=int, nargs="+", default=[40, 400, 4000])
+    diff.add_argument("--repeat", type=int, default=3)
+
+    fragments = subparsers.add_parser("fragments", help="报告片段缓存：只重新生成数据变化的选手卡片与队伍")
+    fragments.add_argument("--sizes", type=int, nargs="+", default=[40, 400])
+    fragments.add_argument("--repeat", type=int, default=3)
+
+    numpy_bench = subparsers.add_parser("numpy", help="NumPy 列式后端 vs 纯 Python 单次遍历")
+    numpy_bench.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    numpy_bench.add_argument("--repeat", type=int, default=3)
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.bench == "analysis":
+        bench_analysis(args.sizes, args.repeat)
+    elif args.bench == "numpy":
+        bench_numpy(args.sizes, args.repeat)
+    elif args.bench == "session":
+        bench_session(args.requests, args.matches)
+    elif args.bench == "reports":
+        bench_reports(args.sizes)
+    elif args.bench == "snapshot":
+        bench_snapshot(args.sizes, args.files, args.repeat)
+    elif args.bench == "output":
+        bench_output(args.days, args.runs_per_day, args.players, args.change_every)
+    elif args.bench == "diff":
+        bench_diff(args.sizes, args.repeat)
+    elif args.bench == "fragments":
+        bench_fragments(args.sizes, args.repeat)
+    elif args.bench == "stream":
+        bench_stream(args.sizes)
+    elif args.bench == "deep":
+        bench_deep(args.sizes, args.page_size)
+    elif args.bench == "memory":
+        bench_results_memory(args.players, args.matches)
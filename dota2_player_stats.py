@@ -109,6 +109,19 @@ TEAMS = {
 BASE_URL = "https://api.opendota.com/api"
 REQUEST_DELAY = 1.5  # 请求间隔（秒），避免触发限流
 MATCHES_LIMIT = 100  # 获取最近的比赛数量
+HTTP_POOL_SIZE = 4   # 保持的长连接数
+
+def create_http_session(pool_size=HTTP_POOL_SIZE):
+    """创建带连接池的 HTTP 会话：长连接复用（省去每次 TCP+TLS 握手），并声明支持 gzip 压缩"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+# 所有请求共享的 HTTP 会话
+http_session = create_http_session()
 
 # ============== 英雄数据 ==============
 
@@ -117,7 +130,7 @@ def get_heroes_map():
     print("正在获取英雄列表...")
     url = f"{BASE_URL}/heroes"
     try:
-        response = requests.get(url, timeout=30)
+        response = http_session.get(url, timeout=30)
         response.raise_for_status()
         heroes = response.json()
         hero_map = {hero['id']: hero['localized_name'] for hero in heroes}
@@ -133,7 +146,7 @@ def get_player_info(account_id):
     """获取玩家基本信息"""
     url = f"{BASE_URL}/players/{account_id}"
     try:
-        response = requests.get(url, timeout=30)
+        response = http_session.get(url, timeout=30)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -145,7 +158,7 @@ def get_player_matches(account_id, limit=100):
     url = f"{BASE_URL}/players/{account_id}/matches"
     params = {"limit": limit}
     try:
-        response = requests.get(url, params=params, timeout=30)
+        response = http_session.get(url, params=params, timeout=30)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -156,7 +169,7 @@ def get_player_heroes(account_id):
     """获取玩家的英雄统计数据"""
     url = f"{BASE_URL}/players/{account_id}/heroes"
     try:
-        response = requests.get(url, params={"limit": 20}, timeout=30)
+        response = http_session.get(url, params={"limit": 20}, timeout=30)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -167,7 +180,7 @@ def get_player_totals(account_id):
     """获取玩家总体统计"""
     url = f"{BASE_URL}/players/{account_id}/totals"
     try:
-        response = requests.get(url, timeout=30)
+        response = http_session.get(url, timeout=30)
         response.raise_for_status()
         return response.json()
     except Exception as e: